@@ -2,10 +2,14 @@ import os
 import re
 import json
 import time
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
 from dotenv import load_dotenv
-from mistralai import Mistral
 
 from src.utils.tooling import generate_tools_json
+from src.utils.rate_limiter import mistral_rate_limiter
+from src.utils.mistral_client import get_mistral_client
+from src.utils.context import compact_messages
 from src.tools import (
     web_search,
     visit_webpage,
@@ -25,11 +29,26 @@ from src.tools import (
 
 load_dotenv()
 
+MAX_CONCURRENT_TASKS = int(os.getenv("MAX_CONCURRENT_TASKS", 4))   # Tasks solved at the same time
+MAX_TOOL_WORKERS = int(os.getenv("MAX_TOOL_WORKERS", 8))           # Tool calls run at the same time by a task
+TOOL_TIMEOUT = int(os.getenv("TOOL_TIMEOUT", 120))            # Default timeout of a tool call, in seconds
+TOOL_TIMEOUTS = {
+    "web_search": 30,
+    "retrieve_knowledge": 60,
+    "reverse_text": 10,
+    "calculate_sum": 10,
+    "transcribe_audio": 300,
+    "analyze_youtube_video": 300,
+}
+
+# Shared by the concurrent tasks: each of them gets MAX_TOOL_WORKERS threads
+tool_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_TASKS * MAX_TOOL_WORKERS, thread_name_prefix="tool")
+
 class Agent:
     def __init__(self):
         self.api_key = os.getenv("MISTRAL_API_KEY")
         self.agent_id = os.getenv("AGENT_ID")
-        self.client = Mistral(api_key=self.api_key)
+        self.client = get_mistral_client()
         self.model = "codestral-latest"
         self.prompt = None
         self.names_to_functions = {
@@ -88,8 +107,8 @@ class Agent:
                 ]
             ).get('tools')
 
-    def make_initial_request(self, input):
-        """Make the initial request to the agent with the given input."""
+    def build_initial_request(self, input):
+        """Build the payload and the messages of the initial request for the given input."""
         with open("./prompt.md", 'r', encoding='utf-8') as file:
             self.prompt = file.read()
         messages = [
@@ -117,8 +136,171 @@ class Agent:
             "prediction": None,
             "parallel_tool_calls": None
         }
+        return payload, messages
+
+    def build_request(self, messages):
+        """Build the payload of a follow-up request for the given conversation, compacted to the context budget."""
+        return {
+            "agent_id": self.agent_id,
+            "messages": compact_messages(messages),
+            "tools": self.all_tools,
+            "tool_choice": 'auto',
+        }
+
+    def make_initial_request(self, input):
+        """Make the initial request to the agent with the given input."""
+        payload, messages = self.build_initial_request(input)
+        mistral_rate_limiter.acquire()
         return self.client.agents.complete(**payload), messages
 
+    async def amake_initial_request(self, input):
+        """Make the initial request to the agent with the given input, without blocking the event loop."""
+        payload, messages = self.build_initial_request(input)
+        await mistral_rate_limiter.acquire_async()
+        return await self.client.agents.complete_async(**payload), messages
+
+    def call_tool(self, tool_call):
+        """Execute a tool call and return its id, name, parameters and result (None on failure)."""
+        function_name = tool_call.function.name
+        function_params = json.loads(tool_call.function.arguments)
+        try:
+            function_result = self.names_to_functions[function_name](**function_params)
+        except Exception as e:
+            function_result = None
+        return tool_call.id, function_name, function_params, function_result
+
+    def submit_tool(self, tool_call):
+        """
+        Submit a tool call to the tool threads.
+        Returns:
+            tuple: The future of the time the call starts, from which its timeout runs (the time spent
+                waiting for a thread does not count), and the future of its result.
+        """
+        started = Future()
+
+        def timed_call():
+            started.set_result(time.monotonic())
+            return self.call_tool(tool_call)
+
+        return started, tool_executor.submit(timed_call)
+
+    @staticmethod
+    def tool_timeout(tool_call):
+        """Return the timeout in seconds allowed for a tool call."""
+        return TOOL_TIMEOUTS.get(tool_call.function.name, TOOL_TIMEOUT)
+
+    @staticmethod
+    def timed_out(tool_call, timeout):
+        """Build the result of a tool call that did not finish in time."""
+        function_name = tool_call.function.name
+        function_params = json.loads(tool_call.function.arguments)
+        return (
+            tool_call.id,
+            function_name,
+            function_params,
+            f"Error occurred: {function_name} timed out after {timeout} seconds",
+        )
+
+    def call_tools(self, tool_calls):
+        """Execute the tool calls of a turn concurrently, keeping the results in call order."""
+        calls = [self.submit_tool(tool_call) for tool_call in tool_calls]
+
+        results = []
+        for tool_call, (started, future) in zip(tool_calls, calls):
+            timeout = self.tool_timeout(tool_call)
+            try:
+                results.append(future.result(timeout=max(0, started.result() + timeout - time.monotonic())))
+            except TimeoutError:
+                results.append(self.timed_out(tool_call, timeout))
+        return results
+
+    async def acall_tools(self, tool_calls):
+        """Execute the tool calls of a turn concurrently in worker threads, keeping the results in call order."""
+        async def bounded_call(tool_call):
+            started, future = self.submit_tool(tool_call)
+            timeout = self.tool_timeout(tool_call)
+            try:
+                started_at = await asyncio.wrap_future(started)
+                return await asyncio.wait_for(
+                    asyncio.wrap_future(future),
+                    timeout=max(0, started_at + timeout - time.monotonic()),
+                )
+            except asyncio.TimeoutError:
+                return self.timed_out(tool_call, timeout)
+
+        return await asyncio.gather(*(bounded_call(tool_call) for tool_call in tool_calls))
+
+    @staticmethod
+    def update_messages(messages, choice, first_iteration, results=None):
+        """
+        Update the conversation with the response of the agent.
+        Args:
+            messages (list): The conversation so far.
+            choice: The first choice of the agent response.
+            first_iteration (bool): Whether this is the response to the initial request.
+            results (list, optional): The results of the tool calls requested by the agent.
+        Returns:
+            tuple: The updated conversation and the final answer (None if not reached yet).
+        """
+        if first_iteration:
+            messages = [message for message in messages if not message.get("prefix")]
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": choice.message.content,
+                    "prefix": True,
+                },
+            )
+            return messages, None
+
+        if choice.message.tool_calls:
+            for tool_call_id, function_name, function_params, function_result in results:
+                messages.append({
+                    "role": "assistant",
+                    "tool_calls": [
+                        {
+                            "id": tool_call_id,
+                            "type": "function",
+                            "function": {
+                                "name": function_name,
+                                "arguments": json.dumps(function_params),
+                            }
+                        }
+                    ]
+                })
+                messages.append(
+                    {
+                        "role": "tool",
+                        "content": function_result if function_result is not None else f"Error occurred: {function_name} failed to execute",
+                        "tool_call_id": tool_call_id,
+                    },
+                )
+                for message in messages:
+                    if "prefix" in message:
+                        del message["prefix"]
+                messages.append(
+                    {
+                        "role": "assistant",
+                        "content": f"Based on the results, ",
+                        "prefix": True,
+                    }
+                )
+            return messages, None
+
+        for message in messages:
+            if "prefix" in message:
+                del message["prefix"]
+        messages.append(
+            {
+                "role": "assistant",
+                "content": choice.message.content,
+            }
+        )
+        if 'FINAL ANSWER:' in choice.message.content:
+            print("\n===== END OF REQUEST =====\n", json.dumps(messages, indent=2))
+            return messages, choice.message.content.split('FINAL ANSWER:')[1].strip()
+        return messages, None
+
     def run(self, input, task_id, truth):
         """Run the agent with the given input and process the response."""
         print("\n===== Asking the agent =====\n")
@@ -126,88 +308,45 @@ class Agent:
         first_iteration = True
 
         while True:
-            time.sleep(1)
             if hasattr(response, 'choices') and response.choices:
                 choice = response.choices[0]
+                results = None
+                if not first_iteration and choice.message.tool_calls:
+                    results = self.call_tools(choice.message.tool_calls)
 
-                if first_iteration:
-                    messages = [message for message in messages if not message.get("prefix")]
-                    messages.append(
-                        {
-                            "role": "assistant",
-                            "content": choice.message.content,
-                            "prefix": True,
-                        },
-                    )
-                    first_iteration = False
-                else:
-                    if choice.message.tool_calls:
-                        results = []
-
-                        for tool_call in choice.message.tool_calls:
-                            function_name = tool_call.function.name
-                            function_params = json.loads(tool_call.function.arguments)
-
-                            try:
-                                function_result = self.names_to_functions[function_name](**function_params)
-                                results.append((tool_call.id, function_name, function_result))
-
-                            except Exception as e:
-                                results.append((tool_call.id, function_name, None))
-
-                        for tool_call_id, function_name, function_result in results:
-                            messages.append({
-                                "role": "assistant",
-                                "tool_calls": [
-                                    {
-                                        "id": tool_call_id,
-                                        "type": "function",
-                                        "function": {
-                                            "name": function_name,
-                                            "arguments": json.dumps(function_params),
-                                        }
-                                    }
-                                ]
-                            })
-                            messages.append(
-                                {
-                                    "role": "tool",
-                                    "content": function_result if function_result is not None else f"Error occurred: {function_name} failed to execute",
-                                    "tool_call_id": tool_call_id,
-                                },
-                            )
-                            for message in messages:
-                                if "prefix" in message:
-                                    del message["prefix"]
-                            messages.append(
-                                {
-                                    "role": "assistant",
-                                    "content": f"Based on the results, ",
-                                    "prefix": True,
-                                }
-                            )
-                    else:
-                        for message in messages:
-                            if "prefix" in message:
-                                del message["prefix"]
-                        messages.append(
-                            {
-                                "role": "assistant",
-                                "content": choice.message.content,
-                            }
-                        )
-                        if 'FINAL ANSWER:' in choice.message.content:
-                            print("\n===== END OF REQUEST =====\n", json.dumps(messages, indent=2))
-                            ans = choice.message.content.split('FINAL ANSWER:')[1].strip()
-                            self.save_log(messages, task_id, truth, final_answer=ans)
-                            return ans
+                messages, ans = self.update_messages(messages, choice, first_iteration, results)
+                first_iteration = False
+                if ans is not None:
+                    self.save_log(messages, task_id, truth, final_answer=ans)
+                    return ans
+
+                print("\n===== MESSAGES BEFORE API CALL =====\n", json.dumps(messages, indent=2))
+                self.save_log(messages, task_id, truth, final_answer=None)
+
+            mistral_rate_limiter.acquire()
+            response = self.client.agents.complete(**self.build_request(messages))
+
+    async def arun(self, input, task_id, truth):
+        """Run the agent with the given input and process the response, without blocking the event loop."""
+        print("\n===== Asking the agent =====\n")
+        response, messages = await self.amake_initial_request(input)
+        first_iteration = True
+
+        while True:
+            if hasattr(response, 'choices') and response.choices:
+                choice = response.choices[0]
+                results = None
+                if not first_iteration and choice.message.tool_calls:
+                    results = await self.acall_tools(choice.message.tool_calls)
+
+                messages, ans = self.update_messages(messages, choice, first_iteration, results)
+                first_iteration = False
+                if ans is not None:
+                    self.save_log(messages, task_id, truth, final_answer=ans)
+                    return ans
 
                 print("\n===== MESSAGES BEFORE API CALL =====\n", json.dumps(messages, indent=2))
-                time.sleep(1)
                 self.save_log(messages, task_id, truth, final_answer=None)
-                response = self.client.agents.complete(
-                    agent_id=self.agent_id,
-                    messages=messages,
-                    tools=self.all_tools,
-                    tool_choice='auto',
-                )
\ No newline at end of file
+
+            await mistral_rate_limiter.acquire_async()
+            response = await self.client.agents.complete_async(**self.build_request(messages))
@@ -1,5 +1,6 @@
 from src.utils.tooling import tool
-from src.utils.vector_store import chunk_content, load_in_vector_db
+from src.utils.vector_store import load_in_vector_db, vector_store, COLLECTION_NAME
+from src.utils.document_store import document_store, content_hash
 
 
 
@@ -12,7 +13,7 @@ def visit_webpage(url: str) -> str:
         url (str): The URL of the webpage to visit.
     """
     try:
-        from src.web2llm.app.scraper import scrape_url
+        from src.web2llm.app.scraper import WebScraper
         from src.web2llm.app.converter import html_to_markdown
         import re
         import requests
@@ -36,16 +37,34 @@ def visit_webpage(url: str) -> str:
 
     try:
         # Web2LLM app
-        result = scrape_url(url, clean=True)
-        markdown_content = html_to_markdown(result["clean_html"])
+        scraper = WebScraper()
+        html_content = scraper.fetch_url(url)
+        if not html_content:
+            return "Error fetching the webpage: no content could be retrieved."
 
-        load_in_vector_db(
+        # Skip cleaning, conversion and vectorization if this exact page is already in the knowledge base
+        html_hash = content_hash(html_content)
+        document = document_store.get(url)
+        if (
+            document
+            and document["content_hash"] == html_hash
+            and document["collection"] == COLLECTION_NAME
+            and len(vector_store.existing_ids(COLLECTION_NAME, document["chunk_ids"])) == len(document["chunk_ids"])
+        ):
+            return "The webpage has been successfully visited: content is already stored in the knowledge base."
+
+        result = scraper.scrape_html(url, html_content, clean=True)
+        markdown_content = html_to_markdown(result["clean_tree"] if result["clean_tree"] is not None else result["clean_html"])
+
+        chunk_ids = load_in_vector_db(
             markdown_content,
             metadatas={
                 "title": result["title"],
                 "url": url,
             }
         )
+        if chunk_ids is not None:
+            document_store.put(url, html_hash, COLLECTION_NAME, result["title"], chunk_ids)
         return "The webpage has been successfully visited: content has been vectorized and stored in the knowledge base."
 
     except requests.exceptions.Timeout:
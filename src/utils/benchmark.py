@@ -0,0 +1,95 @@
+"""
+Scaling benchmark of the chunker used to load pages in the vector database.
+Run with:
+
+    python -m src.utils.benchmark
+"""
+import random
+import time
+
+from src.utils.chunking import chunk_content
+from src.utils.context import CHARS_PER_TOKEN
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit", "sed", "do"]
+
+
+def legacy_chunk_content(markdown_content, chunk_size=2048):
+    """
+    Previous implementation of chunk_content, kept as a reference: the sentence end is searched
+    character by character, up to the end of the text when there is no punctuation.
+    """
+    def find_sentence_end(text, start):
+        punctuations = {'.', '!', '?'}
+        end = start
+        while end < len(text) and text[end] not in punctuations:
+            end += 1
+        while end < len(text) and text[end] in punctuations:
+            end += 1
+        while end > start and text[end - 1] not in punctuations:
+            end -= 1
+        return end
+
+    chunks = []
+    start = 0
+    while start < len(markdown_content):
+        end = min(start + chunk_size, len(markdown_content))
+        end = find_sentence_end(markdown_content, end)
+        chunks.append(markdown_content[start:end].strip())
+        start = end
+    return chunks
+
+
+def generate_markdown(size, punctuation=True, seed=0):
+    """
+    Generates a Markdown document for the benchmark.
+    Args:
+        size (int): The approximate size of the document, in characters.
+        punctuation (bool): If False, the document has no sentence end (e.g. a list of links or a table).
+        seed (int): The seed of the random generator.
+    Returns:
+        str: The document.
+    """
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(12))
+        part = f"{sentence}. " if punctuation else f"{sentence} "
+        if rng.random() < 0.1:
+            part += "\n\n"
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)
+
+
+def benchmark_chunk_content(sizes=(50_000, 100_000, 200_000, 400_000), chunk_tokens=512):
+    """
+    Times the legacy and current chunkers on documents of growing size, with and without punctuation.
+    Args:
+        sizes (tuple): The sizes of the documents, in characters.
+        chunk_tokens (int): The chunk size, in estimated tokens.
+    Returns:
+        list: One dict per document with its size, whether it has punctuation and the time of each chunker.
+    """
+    results = []
+    for punctuation in (True, False):
+        for size in sizes:
+            text = generate_markdown(size, punctuation)
+            timings = {}
+            for name, chunker in (
+                ("legacy", lambda: legacy_chunk_content(text, chunk_tokens * CHARS_PER_TOKEN)),
+                ("current", lambda: list(chunk_content(text, chunk_tokens))),
+            ):
+                started = time.perf_counter()
+                chunker()
+                timings[name] = time.perf_counter() - started
+            results.append({"size": size, "punctuation": punctuation, **timings})
+    return results
+
+
+if __name__ == "__main__":
+    for result in benchmark_chunk_content():
+        print(
+            f"{result['size']:>9} chars, punctuation={result['punctuation']!s:<5} "
+            f"legacy {result['legacy'] * 1000:9.1f} ms   current {result['current'] * 1000:7.1f} ms"
+        )
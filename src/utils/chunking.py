@@ -0,0 +1,224 @@
+import os
+import re
+
+from src.utils.context import CHARS_PER_TOKEN
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 512))                    # Target size of a chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 0))      # Text repeated at the start of the next chunk
+
+# A chunk may end after a run of sentence punctuation followed by whitespace, or at a blank line
+BOUNDARY_PATTERN = re.compile(r'[.!?]+(?=\s)|\n[ \t]*\n')
+# Matches from the start of a chunk up to its last boundary: the greedy prefix runs to the end of the
+# searched range and backtracks to the last boundary, in a single scan of the chunk done by the regex engine
+LAST_BOUNDARY_PATTERN = re.compile(r'[\s\S]*(?:[.!?](?=\s)|\n[ \t]*\n)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def chunk_content(markdown_content, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, reserved_chars=0):
+    """
+    Splits a text into chunks of about `chunk_tokens` tokens without cutting sentences, lazily.
+    Each chunk ends at the last sentence end or blank line that fits; a sentence longer than a
+    chunk is cut at the last whitespace that fits. Only the characters of each chunk (and of its
+    overlap) are scanned, so the cost is linear in the size of the text.
+    Args:
+        markdown_content (str): The text to split.
+        chunk_tokens (int): The maximum size of a chunk, in estimated tokens.
+        overlap_tokens (int): The size of the text repeated from the end of the previous chunk, in
+            estimated tokens. The overlap starts after a sentence boundary, or at a word when
+            there is none in it, so it may be shorter.
+        reserved_chars (int): The characters already taken in the first chunk (e.g. by the headings
+            it will be appended to), which is shorter by as much but keeps at least half of the
+            chunk size: the chunk goes over it when the headings take more than half.
+    Returns:
+        Iterator[str]: The non-empty chunks, in order.
+    """
+    max_chars = max(1, chunk_tokens * CHARS_PER_TOKEN)
+    overlap_chars = min(max(0, overlap_tokens * CHARS_PER_TOKEN), max_chars // 2)
+    chunk_chars = max(1, max_chars - reserved_chars, max_chars // 2)
+    length = len(markdown_content)
+    start = 0
+    covered = 0     # End of the previous chunk: a chunk starting in its overlap must end after it
+
+    while start < length:
+        limit = start + chunk_chars
+        if limit >= length:
+            end = length
+        else:
+            match = LAST_BOUNDARY_PATTERN.match(markdown_content, start, limit)
+            if match and match.end() > covered:
+                end = match.end()
+            else:
+                # No sentence end fits: cut at the last whitespace, or in the middle of a word
+                cut = max(markdown_content.rfind(' ', start, limit), markdown_content.rfind('\n', start, limit))
+                end = cut + 1 if cut > start and cut >= covered else limit
+
+        chunk = markdown_content[start:end].strip()
+        if chunk:
+            yield chunk
+        if end >= length:
+            return
+
+        covered = end
+        chunk_chars = max_chars
+        next_start = end
+        if overlap_chars:
+            window = max(start + 1, end - overlap_chars)
+            overlap = BOUNDARY_PATTERN.search(markdown_content, window, end)
+            if not (overlap and overlap.end() < end):
+                # No sentence boundary in the overlap: start it at the first word that fits
+                overlap = WHITESPACE_PATTERN.search(markdown_content, window, end)
+            if overlap and overlap.end() < end:
+                next_start = overlap.end()
+        start = next_start
+
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})[ \t]+(.*?)[ \t#]*$')
+FENCE_PATTERN = re.compile(r'^[ \t]*(`{3,}|~{3,})')
+TABLE_SEPARATOR_PATTERN = re.compile(r'^[ \t]*\|?[ \t]*:?-{3,}')
+HEADING_PATH_SEPARATOR = " > "
+
+
+def closes_fence(line, fence):
+    """
+    Tells whether a line closes a fenced code block: it holds only fence characters, at least as
+    many as the opening fence (a line such as "```python" opens a block, it does not close one).
+    Args:
+        line (str): The line.
+        fence (str): The opening fence, e.g. "```".
+    Returns:
+        bool: True if the line closes the block.
+    """
+    stripped = line.strip()
+    return stripped.startswith(fence) and not stripped.strip(fence[0])
+
+
+def iter_markdown_blocks(markdown_content):
+    """
+    Splits a Markdown text into its blocks, in a single pass over its lines.
+    Args:
+        markdown_content (str): The Markdown text.
+    Returns:
+        Iterator[tuple]: (kind, text, level) for each block, where kind is "heading" (level is its
+            level), "code" (a fenced code block), "table" (consecutive rows starting with "|") or
+            "text" (a paragraph or a list); level is 0 for the blocks that are not headings.
+    """
+    kind, lines, fence = None, [], None
+    for line in markdown_content.split('\n'):
+        if fence:
+            lines.append(line)
+            if closes_fence(line, fence):
+                yield "code", '\n'.join(lines), 0
+                kind, lines, fence = None, [], None
+            continue
+
+        fence_match = FENCE_PATTERN.match(line)
+        heading_match = HEADING_PATTERN.match(line)
+        is_row = line.lstrip().startswith('|')
+        if lines and (fence_match or heading_match or not line.strip() or (kind == "table") != is_row):
+            yield kind, '\n'.join(lines), 0
+            kind, lines = None, []
+
+        if fence_match:
+            kind, lines, fence = "code", [line], fence_match.group(1)
+        elif heading_match:
+            yield "heading", line.strip(), len(heading_match.group(1))
+        elif line.strip():
+            kind = "table" if is_row else "text"
+            lines.append(line)
+
+    if lines:
+        yield kind, '\n'.join(lines), 0
+
+
+def split_block(kind, text, max_chars, reserved_chars, chunk_tokens, overlap_tokens):
+    """
+    Splits a block larger than a chunk. Tables are split between rows and each piece repeats the
+    header of the table; code blocks are split between lines and each piece is fenced again.
+    Args:
+        kind (str): The kind of the block, as given by iter_markdown_blocks.
+        text (str): The block.
+        max_chars (int): The maximum size of a piece, in characters.
+        reserved_chars (int): The characters already taken in the first piece (pending headings), up
+            to half of max_chars.
+        chunk_tokens (int): The maximum size of a piece, in estimated tokens (for text blocks).
+        overlap_tokens (int): The overlap between pieces of a text block, in estimated tokens.
+    Returns:
+        Iterator[str]: The pieces of the block.
+    """
+    if kind == "text":
+        yield from chunk_content(text, chunk_tokens, overlap_tokens, reserved_chars)
+        return
+
+    lines = text.split('\n')
+    if kind == "table":
+        header_size = 2 if len(lines) > 1 and TABLE_SEPARATOR_PATTERN.match(lines[1]) else 1
+        header, footer, lines = lines[:header_size], [], lines[header_size:]
+    else:
+        fence = FENCE_PATTERN.match(lines[0]).group(1)
+        closed = len(lines) > 1 and closes_fence(lines[-1], fence)
+        header, footer, lines = lines[:1], [fence], lines[1:-1] if closed else lines[1:]
+
+    fixed_size = sum(len(line) + 1 for line in header + footer)
+    piece, size = [], fixed_size + min(reserved_chars, max_chars // 2)
+    for line in lines:
+        if piece and size + len(line) + 1 > max_chars:
+            yield '\n'.join(header + piece + footer)
+            piece, size = [], fixed_size
+        piece.append(line)
+        size += len(line) + 1
+    if piece:
+        yield '\n'.join(header + piece + footer)
+
+
+def chunk_markdown(markdown_content, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Splits a Markdown text into chunks that follow its section tree, lazily.
+    A chunk never spans two sections; consecutive blocks of a section are grouped up to the chunk
+    size, and tables and code blocks are kept whole unless they are larger than a chunk. Each chunk
+    comes with the path of the headings of its section, e.g. "Guide > Installation > Linux".
+    Args:
+        markdown_content (str): The Markdown text.
+        chunk_tokens (int): The maximum size of a chunk, in estimated tokens.
+        overlap_tokens (int): The overlap between the chunks of a paragraph larger than a chunk, in estimated tokens.
+    Returns:
+        Iterator[dict]: For each chunk, its "text" and its "heading_path" (empty before the first heading).
+    """
+    max_chars = max(1, chunk_tokens * CHARS_PER_TOKEN)
+    headings = []           # (level, title) of the headings of the current section
+    parts, size = [], 0     # Blocks of the chunk being built
+    has_content = False     # Whether the chunk has more than headings
+
+    def heading_path():
+        return HEADING_PATH_SEPARATOR.join(title for _, title in headings)
+
+    for kind, text, level in iter_markdown_blocks(markdown_content):
+        if kind == "heading":
+            if has_content:
+                yield {"text": '\n\n'.join(parts), "heading_path": heading_path()}
+                parts, size, has_content = [], 0, False
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, HEADING_PATTERN.match(text).group(2)))
+            # A heading directly followed by another one stays with the content of the subsection
+            parts.append(text)
+            size += len(text) + 2
+            continue
+
+        if size + len(text) > max_chars and has_content:
+            yield {"text": '\n\n'.join(parts), "heading_path": heading_path()}
+            parts, size, has_content = [], 0, False
+
+        if size + len(text) > max_chars:
+            # The block alone does not fit: its pieces are chunks of their own, after the pending headings
+            for piece in split_block(kind, text, max_chars, size, chunk_tokens, overlap_tokens):
+                yield {"text": '\n\n'.join(parts + [piece]), "heading_path": heading_path()}
+                parts, size = [], 0
+            has_content = False
+            continue
+
+        parts.append(text)
+        size += len(text) + 2
+        has_content = True
+
+    if parts:
+        yield {"text": '\n\n'.join(parts), "heading_path": heading_path()}
@@ -0,0 +1,101 @@
+import os
+import json
+
+CHARS_PER_TOKEN = 4                                                   # Rough average for English text and markdown
+MESSAGE_OVERHEAD_TOKENS = 4                                           # Role and separators of each message
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", 24000))      # Budget for the messages sent to the API
+KEEP_RECENT_TOOL_OUTPUTS = int(os.getenv("KEEP_RECENT_TOOL_OUTPUTS", 2))
+TRUNCATED_OUTPUT_TOKENS = 256                                         # Size kept from a compacted tool output
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens of a text without calling a tokenizer.
+    Args:
+        text (str): The text to measure.
+    Returns:
+        int: The estimated number of tokens.
+    """
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_tokens(message):
+    """
+    Estimates the number of tokens a message adds to a request.
+    Args:
+        message (dict): A message of the conversation.
+    Returns:
+        int: The estimated number of tokens.
+    """
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content"))
+    if message.get("tool_calls"):
+        tokens += estimate_tokens(json.dumps(message["tool_calls"]))
+    return tokens
+
+
+def truncate_output(content, max_tokens):
+    """
+    Keeps the beginning of a tool output and notes how much was dropped.
+    Args:
+        content (str): The tool output.
+        max_tokens (int): The number of tokens to keep.
+    Returns:
+        str: The truncated output.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(content) <= max_chars:
+        return content
+    dropped = estimate_tokens(content[max_chars:])
+    return (
+        f"{content[:max_chars]}\n\n"
+        f"[... {dropped} tokens of this output were truncated to save context. "
+        f"Call the tool again if you need the full result.]"
+    )
+
+
+def compact_messages(messages, max_tokens=MAX_CONTEXT_TOKENS, keep_recent=KEEP_RECENT_TOOL_OUTPUTS):
+    """
+    Bounds the size of a conversation by truncating old tool outputs once the token budget is exceeded.
+    The system prompt, the question and the assistant messages are never modified, and the conversation
+    passed in is left untouched so that the full history can still be logged.
+    Args:
+        messages (list): The conversation.
+        max_tokens (int): The token budget of the request.
+        keep_recent (int): The number of most recent tool outputs kept intact while possible.
+    Returns:
+        list: The conversation to send to the API.
+    """
+    counts = [message_tokens(message) for message in messages]
+    total = sum(counts)
+    if total <= max_tokens:
+        return messages
+
+    tool_indices = [i for i, message in enumerate(messages) if message.get("role") == "tool"]
+    old_indices = tool_indices[:-keep_recent] if keep_recent else tool_indices
+    recent_indices = tool_indices[len(old_indices):]
+
+    compacted = list(messages)
+
+    def shrink(index, budget):
+        nonlocal total
+        message = compacted[index]
+        content = truncate_output(message.get("content") or "", budget)
+        compacted[index] = {**message, "content": content}
+        new_count = message_tokens(compacted[index])
+        total -= counts[index] - new_count
+        counts[index] = new_count
+
+    for index in old_indices:                                         # Oldest outputs go first
+        if total <= max_tokens:
+            return compacted
+        shrink(index, TRUNCATED_OUTPUT_TOKENS)
+
+    for index in recent_indices:                                      # Last resort: cut recent outputs to fit
+        if total <= max_tokens:
+            return compacted
+        excess = total - max_tokens
+        shrink(index, max(TRUNCATED_OUTPUT_TOKENS, estimate_tokens(compacted[index].get("content")) - excess))
+
+    return compacted
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DOCUMENT_STORE_PATH = os.getenv("DOCUMENT_STORE_PATH", "./document_store.sqlite")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """
+    Normalizes a URL so that trivial variants of the same page share one key.
+    The scheme and host are lowercased, default ports and fragments are dropped, query
+    parameters are sorted and a trailing slash is removed from the path.
+    Args:
+        url (str): The URL.
+    Returns:
+        str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def content_hash(html):
+    """Returns the SHA-256 of a raw HTML page."""
+    return hashlib.sha256(html.encode("utf-8", "replace")).hexdigest()
+
+
+class DocumentStore:
+    """
+    Persistent record of the pages already scraped, converted and loaded in the vector database,
+    keyed by normalized URL and stored in SQLite. A page whose raw HTML has the same hash as the
+    recorded one does not need to be processed again. Safe to share between threads.
+    Args:
+        path (str): The path of the SQLite database.
+    """
+    def __init__(self, path=DOCUMENT_STORE_PATH):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """The SQLite connection, opened on first use."""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "url TEXT PRIMARY KEY, content_hash TEXT NOT NULL, collection TEXT NOT NULL, "
+                "title TEXT, chunk_ids TEXT NOT NULL, processed_at REAL NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, url):
+        """
+        Looks up the processed version of a page.
+        Args:
+            url (str): The URL of the page.
+        Returns:
+            dict: The recorded document, or None if the page was never processed.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT content_hash, collection, title, chunk_ids, processed_at "
+                "FROM documents WHERE url = ?", (normalize_url(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "url": normalize_url(url),
+            "content_hash": row[0],
+            "collection": row[1],
+            "title": row[2],
+            "chunk_ids": json.loads(row[3]),
+            "processed_at": row[4],
+        }
+
+    def put(self, url, html_hash, collection, title, chunk_ids):
+        """
+        Records the processed version of a page, replacing any previous one.
+        Args:
+            url (str): The URL of the page.
+            html_hash (str): The hash of the raw HTML the document was built from.
+            collection (str): The collection the chunks were loaded into.
+            title (str): The title of the page.
+            chunk_ids (list): The ids of the chunks of the page in the collection.
+        """
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO documents (url, content_hash, collection, title, chunk_ids, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), html_hash, collection, title, json.dumps(chunk_ids), time.time()),
+            )
+            self.connection.commit()
+
+    def delete_collection(self, collection):
+        """Forgets the documents loaded into a collection that has been deleted."""
+        with self._lock:
+            self.connection.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+            self.connection.commit()
+
+
+document_store = DocumentStore()
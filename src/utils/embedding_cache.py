@@ -0,0 +1,114 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 200000))     # Maximum number of cached embeddings
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of text embeddings stored in SQLite.
+    Entries are keyed by the SHA-256 of (model, text) and evicted in least recently used order.
+    Safe to share between threads.
+    Args:
+        path (str): The path of the SQLite database.
+        max_entries (int): The maximum number of embeddings kept on disk.
+    """
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """The SQLite connection, opened on first use."""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def make_key(model, text):
+        """Return the cache key of a text embedded with a given model."""
+        return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, model, texts, batch_size=500):
+        """
+        Look up the cached embeddings of several texts.
+        Args:
+            model (str): The embedding model.
+            texts (list): The texts to look up.
+        Returns:
+            dict: The embeddings found, keyed by text.
+        """
+        keys = {self.make_key(model, text): text for text in texts}
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            for i in range(0, len(key_list), batch_size):
+                batch = key_list[i:i + batch_size]
+                rows = self.connection.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[keys[key]] = np.frombuffer(blob, dtype=np.float64).tolist()
+
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, self.make_key(model, text)) for text in found],
+                )
+                self.connection.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model, texts, embeddings):
+        """
+        Store the embeddings of several texts, evicting the least recently used entries above the size limit.
+        Args:
+            model (str): The embedding model.
+            texts (list): The embedded texts.
+            embeddings (list): The embeddings, in the same order as the texts.
+        """
+        now = time.time()
+        rows = [
+            (self.make_key(model, text), np.asarray(embedding, dtype=np.float64).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self.connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self.connection.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self.connection.commit()
+
+    def stats(self):
+        """Return the hit and miss counters of the cache."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,71 @@
+import os
+import asyncio
+import threading
+import weakref
+import httpx
+from dotenv import load_dotenv
+from mistralai import Mistral
+
+load_dotenv()
+MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
+MAX_CONNECTIONS = int(os.getenv("MISTRAL_MAX_CONNECTIONS", 20))
+KEEPALIVE_EXPIRY = 120                                                # Seconds an idle connection is kept open
+
+_limits = httpx.Limits(
+    max_connections=MAX_CONNECTIONS,
+    max_keepalive_connections=MAX_CONNECTIONS,
+    keepalive_expiry=KEEPALIVE_EXPIRY,
+)
+_lock = threading.Lock()
+_http_client = None
+_client = None
+_loop_clients = weakref.WeakKeyDictionary()      # Event loop -> (Mistral client, its asynchronous HTTP client)
+
+
+def get_http_client():
+    """Return the process-wide HTTP client whose keep-alive connections are reused by every Mistral call."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits, follow_redirects=True)
+        return _http_client
+
+
+def get_mistral_client():
+    """
+    Return a shared Mistral client using pooled, keep-alive HTTP connections.
+    Synchronous calls share a single connection pool across the process. An asynchronous
+    connection pool cannot outlive its event loop, so one client is kept per running loop, to be
+    closed with aclose_mistral_client before the loop ends.
+    Returns:
+        Mistral: The client.
+    """
+    global _client
+    http_client = get_http_client()
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    with _lock:
+        if loop is None:
+            if _client is None:
+                _client = Mistral(api_key=MISTRAL_API_KEY, client=http_client)
+            return _client
+
+        if loop not in _loop_clients:
+            async_client = httpx.AsyncClient(limits=_limits, follow_redirects=True)
+            client = Mistral(api_key=MISTRAL_API_KEY, client=http_client, async_client=async_client)
+            _loop_clients[loop] = (client, async_client)
+        return _loop_clients[loop][0]
+
+
+async def aclose_mistral_client():
+    """
+    Close the connections of the client of the running event loop, which cannot be reused once the
+    loop ends. A later call to get_mistral_client in this loop creates a new client.
+    """
+    with _lock:
+        _, async_client = _loop_clients.pop(asyncio.get_running_loop(), (None, None))
+    if async_client is not None:
+        await async_client.aclose()
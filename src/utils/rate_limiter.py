@@ -0,0 +1,42 @@
+import os
+import time
+import asyncio
+import threading
+
+MISTRAL_RATE_LIMIT = float(os.getenv("MISTRAL_RATE_LIMIT", 1))   # Requests per second allowed by the API
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter spacing calls so that at most `rate` of them start per second.
+    The same instance can be shared by threads and by asyncio tasks.
+    Args:
+        rate (float): The maximum number of calls per second.
+    """
+    def __init__(self, rate=MISTRAL_RATE_LIMIT):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Reserve the next free slot and return how long the caller has to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
+
+    def acquire(self):
+        """Block the current thread until a call is allowed."""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a call is allowed."""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+mistral_rate_limiter = RateLimiter()
@@ -1,78 +1,133 @@
 import os
 from dotenv import load_dotenv
-from mistralai import Mistral
 import numpy as np
 import time
 import chromadb
 from chromadb.config import Settings
 import json
 import hashlib
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.embedding_cache import embedding_cache
+from src.utils.document_store import document_store
+from src.utils.chunking import chunk_markdown
+from src.utils.mistral_client import get_mistral_client
+from src.utils.rate_limiter import mistral_rate_limiter
+from src.utils.context import estimate_tokens
 
 load_dotenv()
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
+EMBEDDING_MODEL = "mistral-embed"
 COLLECTION_NAME = "webpages_collection"
 PERSIST_DIRECTORY = "./chroma_db"
-
-def vectorize(input_texts, batch_size=5):
+ADD_BATCH_SIZE = int(os.getenv("CHROMA_ADD_BATCH_SIZE", 256))
+EMBEDDING_MAX_BATCH_TOKENS = 12000          # Below the 16k tokens accepted per request, as token counts are estimated
+EMBEDDING_MAX_BATCH_SIZE = 128
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+EMBEDDING_MAX_RETRIES = 6
+EMBEDDING_BACKOFF_BASE = 1.0                # Seconds
+EMBEDDING_BACKOFF_MAX = 60.0
+
+def make_embedding_batches(input_texts, max_batch_tokens=EMBEDDING_MAX_BATCH_TOKENS,
+                           max_batch_size=EMBEDDING_MAX_BATCH_SIZE):
     """
-    Get the text embeddings for the given inputs using Mistral API.
+    Group texts into batches as large as the embedding API allows, sized by their token count.
     """
-    try:
-        client = Mistral(api_key=MISTRAL_API_KEY)
-    except Exception as e:
-        print(f"Error initializing Mistral client: {e}")
-        return []
-
-    embeddings = []
+    batches = []
+    batch, batch_tokens = [], 0
+    for text in input_texts:
+        tokens = estimate_tokens(text)
+        if batch and (batch_tokens + tokens > max_batch_tokens or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def retry_delay(error, attempt):
+    """
+    Compute how long to wait before retrying a rate-limited request.
+    Uses the Retry-After hint of the server when present, otherwise exponential backoff with full jitter.
+    """
+    response = getattr(error, 'raw_response', None)
+    headers = getattr(response, 'headers', None) or {}
+    retry_after = headers.get('retry-after')
+    if retry_after:
+        try:
+            return float(retry_after) + random.uniform(0, EMBEDDING_BACKOFF_BASE)
+        except ValueError:
+            pass
+    return random.uniform(0, min(EMBEDDING_BACKOFF_MAX, EMBEDDING_BACKOFF_BASE * 2 ** attempt))
 
-    for i in range(0, len(input_texts), batch_size):
-        batch = input_texts[i:i + batch_size]
-        while True:
-            try:
-                embeddings_batch_response = client.embeddings.create(
-                    model="mistral-embed",
-                    inputs=batch
-                )
-                time.sleep(1)
-                embeddings.extend([data.embedding for data in embeddings_batch_response.data])
-                break
-            except Exception as e:
-                if "rate limit exceeded" in str(e).lower():
-                    print("Rate limit exceeded. Retrying after 10 seconds...")
-                    time.sleep(10)
-                else:
-                    print(f"Error in embedding batch: {e}")
-                    raise
 
-    return embeddings
+def is_rate_limited(error):
+    """Tell whether an API error is due to rate limiting."""
+    return getattr(error, 'status_code', None) == 429 or "rate limit" in str(error).lower()
 
 
-def chunk_content(markdown_content, chunk_size=2048):
+def embed_batch(client, batch):
     """
-    Vectorizes the given markdown content into chunks of specified size without cutting sentences.
+    Embed a batch of texts, backing off and retrying while the API is rate limiting.
     """
-    def find_sentence_end(text, start):
-        """Find the nearest sentence end from the start index."""
-        punctuations = {'.', '!', '?'}
-        end = start
-        while end < len(text) and text[end] not in punctuations:
-            end += 1
-        while end < len(text) and text[end] in punctuations:
-            end += 1
-        while end > start and text[end - 1] not in punctuations:
-            end -= 1
-        return end
-
-    chunks = []
-    start = 0
+    for attempt in range(EMBEDDING_MAX_RETRIES):
+        mistral_rate_limiter.acquire()
+        try:
+            embeddings_batch_response = client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                inputs=batch
+            )
+            return [data.embedding for data in embeddings_batch_response.data]
+        except Exception as e:
+            if not is_rate_limited(e) or attempt == EMBEDDING_MAX_RETRIES - 1:
+                print(f"Error in embedding batch: {e}")
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"Rate limit exceeded. Retrying after {delay:.1f} seconds...")
+            time.sleep(delay)
+
+
+def vectorize(input_texts, max_batch_tokens=EMBEDDING_MAX_BATCH_TOKENS, max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+              concurrency=EMBEDDING_CONCURRENCY):
+    """
+    Get the text embeddings for the given inputs using Mistral API.
+    Embeddings already computed are served from the on-disk embedding cache, the others are
+    requested in token-sized batches, several at a time.
+    """
+    cached = embedding_cache.get_many(EMBEDDING_MODEL, input_texts)
+    missing_texts = [text for text in dict.fromkeys(input_texts) if text not in cached]
+
+    if missing_texts:
+        try:
+            client = get_mistral_client()
+        except Exception as e:
+            print(f"Error initializing Mistral client: {e}")
+            return []
+
+        batches = make_embedding_batches(missing_texts, max_batch_tokens, max_batch_size)
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as executor:
+            embeddings = [
+                embedding
+                for batch_embeddings in executor.map(lambda batch: embed_batch(client, batch), batches)
+                for embedding in batch_embeddings
+            ]
+        elapsed = max(time.monotonic() - started, 1e-6)
+        tokens = sum(estimate_tokens(text) for text in missing_texts)
+        print(
+            f"Embedded {len(missing_texts)} texts (~{tokens} tokens) in {len(batches)} batches "
+            f"and {elapsed:.2f}s: {len(missing_texts) / elapsed:.1f} texts/s, {tokens / elapsed:.0f} tokens/s"
+        )
 
-    while start < len(markdown_content):
-        end = min(start + chunk_size, len(markdown_content))
-        end = find_sentence_end(markdown_content, end)
-        chunks.append(markdown_content[start:end].strip())
-        start = end
+        embedding_cache.put_many(EMBEDDING_MODEL, missing_texts, embeddings)
+        cached.update(zip(missing_texts, embeddings))
 
-    return chunks
+    stats = embedding_cache.stats()
+    print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses")
+    return [cached[text] for text in input_texts]
 
 
 def generate_chunk_id(chunk):
@@ -80,61 +135,169 @@ def generate_chunk_id(chunk):
     return hashlib.sha256(chunk.encode('utf-8')).hexdigest()
 
 
+class VectorStore:
+    """
+    Process-wide access to the ChromaDB database.
+    Owns a single persistent client and caches collection handles so that repeated calls
+    do not reopen the database. Safe to share between threads.
+    """
+    def __init__(self, persist_directory=PERSIST_DIRECTORY):
+        self.persist_directory = persist_directory
+        self._client = None
+        self._collections = {}
+        self._lock = threading.RLock()
+
+    @property
+    def client(self):
+        """The ChromaDB client, created on first use."""
+        with self._lock:
+            if self._client is None:
+                self._client = chromadb.PersistentClient(path=self.persist_directory)
+            return self._client
+
+    def get_collection(self, collection_name=COLLECTION_NAME, create=False):
+        """
+        Return the handle of a collection, creating the collection if asked.
+
+        :param collection_name: The name of the collection.
+        :param create: If True, create the collection when it does not exist.
+        :return: The collection handle.
+        """
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                if create:
+                    collection = self.client.get_or_create_collection(collection_name)
+                else:
+                    collection = self.client.get_collection(collection_name)
+                self._collections[collection_name] = collection
+            return collection
+
+    def add(self, collection_name=COLLECTION_NAME, **kwargs):
+        """Add items to a collection, creating it if needed."""
+        collection = self.get_collection(collection_name, create=True)
+        with self._lock:
+            collection.add(**kwargs)
+
+    def add_in_batches(self, collection_name=COLLECTION_NAME, ids=None, embeddings=None, documents=None,
+                       metadatas=None, batch_size=ADD_BATCH_SIZE):
+        """
+        Add items to a collection with one write per batch instead of one per item.
+        A failing batch is reported and skipped, the other batches are still written.
+
+        :param collection_name: The name of the collection.
+        :param ids: The IDs of the items.
+        :param embeddings: The embeddings of the items.
+        :param documents: The documents of the items.
+        :param metadatas: The metadata of the items (optional).
+        :param batch_size: The number of items written per batch.
+        :return: The number of items added.
+        """
+        added = 0
+        for i in range(0, len(ids), batch_size):
+            batch = slice(i, i + batch_size)
+            try:
+                self.add(
+                    collection_name,
+                    ids=ids[batch],
+                    embeddings=embeddings[batch],
+                    documents=documents[batch],
+                    metadatas=metadatas[batch] if metadatas else None,
+                )
+                added += len(ids[batch])
+            except Exception as e:
+                print(f"Error adding batch {i // batch_size + 1} ({len(ids[batch])} items) to collection: {e}")
+        return added
+
+    def get(self, collection_name=COLLECTION_NAME, **kwargs):
+        """Get items from a collection."""
+        return self.get_collection(collection_name).get(**kwargs)
+
+    def existing_ids(self, collection_name=COLLECTION_NAME, ids=None, batch_size=500):
+        """
+        Return the subset of the given IDs already stored in a collection.
+        Only IDs are fetched, so the cost depends on the number of candidates, not on the size of the collection.
+
+        :param collection_name: The name of the collection.
+        :param ids: The candidate IDs.
+        :param batch_size: The number of IDs looked up per request.
+        :return: The set of IDs present in the collection.
+        """
+        collection = self.get_collection(collection_name)
+        ids = list(ids or [])
+        found = set()
+        for i in range(0, len(ids), batch_size):
+            found.update(collection.get(ids=ids[i:i + batch_size], include=[])['ids'])
+        return found
+
+    def query(self, collection_name=COLLECTION_NAME, **kwargs):
+        """Query a collection by similarity."""
+        return self.get_collection(collection_name).query(**kwargs)
+
+    def delete(self, collection_name=COLLECTION_NAME, ids=None):
+        """Delete items from a collection based on their IDs."""
+        collection = self.get_collection(collection_name)
+        with self._lock:
+            collection.delete(ids=ids)
+
+    def delete_collection(self, collection_name=COLLECTION_NAME):
+        """Delete a collection and forget its handle."""
+        with self._lock:
+            self._collections.pop(collection_name, None)
+            self.client.delete_collection(collection_name)
+
+
+vector_store = VectorStore()
+
+
 def load_in_vector_db(markdown_content, metadatas=None, collection_name=COLLECTION_NAME):
     """
     Load the text embeddings into a ChromaDB collection for efficient similarity search.
+    The content is split along its Markdown sections, and the metadata of each chunk gets the
+    path of the headings of its section ("heading_path") in addition to the given metadatas.
+    Returns the ids of all the chunks of the content once they are stored in the collection,
+    or None if they could not all be stored.
     """
     try:
-        client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
-    except Exception as e:
-        print(f"Error initializing ChromaDB client: {e}")
-        return
-
-    try:
-        if collection_name not in [col.name for col in client.list_collections()]:
-            collection = client.create_collection(collection_name)
-        else:
-            collection = client.get_collection(collection_name)
+        vector_store.get_collection(collection_name, create=True)
     except Exception as e:
         print(f"Error accessing collection: {e}")
-        return
+        return None
+
+    chunks_by_id = {}
+    metadatas_by_id = {}
+    for chunk in chunk_markdown(markdown_content):
+        chunk_id = generate_chunk_id(chunk["text"])
+        if chunk_id not in chunks_by_id:
+            chunks_by_id[chunk_id] = chunk["text"]
+            metadatas_by_id[chunk_id] = {**(metadatas or {}), "heading_path": chunk["heading_path"]}
 
     try:
-        existing_items = collection.get()
+        existing_ids = vector_store.existing_ids(collection_name, chunks_by_id.keys())
     except Exception as e:
         print(f"Error retrieving existing items: {e}")
-        return
-
-    existing_ids = set()
-
-    if 'ids' in existing_items:
-        existing_ids.update(existing_items['ids'])
+        return None
 
-    chunks = chunk_content(markdown_content)
-    text_to_vectorize = []
-
-    for chunk in chunks:
-        chunk_id = generate_chunk_id(chunk)
-        if chunk_id not in existing_ids:
-            text_to_vectorize.append(chunk)
+    text_to_vectorize = [chunk for chunk_id, chunk in chunks_by_id.items() if chunk_id not in existing_ids]
 
     print(f"New chunks to vectorize: {len(text_to_vectorize)}")
 
     if text_to_vectorize:
+        expected = len(text_to_vectorize)
         embeddings = vectorize(text_to_vectorize)
-        for embedding, chunk in zip(embeddings, text_to_vectorize):
-            chunk_id = generate_chunk_id(chunk)
-            if chunk_id not in existing_ids:
-                try:
-                    collection.add(
-                        embeddings=[embedding],
-                        documents=[chunk],
-                        metadatas=[metadatas],
-                        ids=[chunk_id]
-                    )
-                    existing_ids.add(chunk_id)
-                except Exception as e:
-                    print(f"Error adding embedding to collection: {e}")
+        text_to_vectorize = text_to_vectorize[:len(embeddings)]
+        added = vector_store.add_in_batches(
+            collection_name,
+            ids=[generate_chunk_id(chunk) for chunk in text_to_vectorize],
+            embeddings=embeddings,
+            documents=text_to_vectorize,
+            metadatas=[metadatas_by_id[generate_chunk_id(chunk)] for chunk in text_to_vectorize],
+        )
+        print(f"Chunks added to the collection: {added}/{len(text_to_vectorize)}")
+        if added < expected:
+            return None
+
+    return list(chunks_by_id)
 
 
 def retrieve_from_database(query, collection_name=COLLECTION_NAME, n_results=5, distance_threshold=None):
@@ -142,8 +305,7 @@ def retrieve_from_database(query, collection_name=COLLECTION_NAME, n_results=5,
     Retrieve the most similar documents from the vector store based on the query.
     """
     try:
-        client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
-        collection = client.get_collection(collection_name)
+        vector_store.get_collection(collection_name)
     except Exception as e:
         print(f"Error accessing collection: {e}")
         return
@@ -155,7 +317,8 @@ def retrieve_from_database(query, collection_name=COLLECTION_NAME, n_results=5,
         return
 
     try:
-        raw_results = collection.query(
+        raw_results = vector_store.query(
+            collection_name,
             query_embeddings=query_embeddings,
             n_results=n_results,
             include=["documents", "metadatas", "distances"]
@@ -198,16 +361,13 @@ def search_documents(collection_name=COLLECTION_NAME, query=None, query_embeddin
     :param n_results: The number of results to return (default is 10).
     :return: The search results.
     """
-    client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
-    collection = client.get_collection(collection_name)
-
     if query:
         query_embedding = vectorize([query])[0]
 
     if query_embedding:
-        results = collection.query(query_embeddings=[query_embedding], n_results=n_results, where=metadata_filter)
+        results = vector_store.query(collection_name, query_embeddings=[query_embedding], n_results=n_results, where=metadata_filter)
     else:
-        results = collection.get(where=metadata_filter, limit=n_results)
+        results = vector_store.get(collection_name, where=metadata_filter, limit=n_results)
 
     return results
 
@@ -219,10 +379,7 @@ def delete_documents(collection_name=COLLECTION_NAME, ids=None):
     :param collection_name: The name of the collection.
     :param ids: A list of IDs of the documents to delete.
     """
-    client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
-    collection = client.get_collection(collection_name)
-
-    collection.delete(ids=ids)
+    vector_store.delete(collection_name, ids=ids)
     print(f"Documents with IDs {ids} have been deleted from the collection {collection_name}.")
 
 def delete_collection(collection_name=COLLECTION_NAME):
@@ -231,6 +388,6 @@ def delete_collection(collection_name=COLLECTION_NAME):
 
     :param collection_name: The name of the collection to delete.
     """
-    client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
-    client.delete_collection(collection_name)
+    vector_store.delete_collection(collection_name)
+    document_store.delete_collection(collection_name)
     print(f"Collection {collection_name} has been deleted.")
\ No newline at end of file
@@ -0,0 +1,419 @@
+"""
+Gestion des tâches de scraping en arrière-plan.
+
+Chaque tâche est enregistrée sur disque: un fichier JSON décrit la tâche et un fichier JSON Lines
+reçoit le résultat de chaque URL dès qu'il est disponible. Seuls l'état et la progression des tâches
+en cours restent en mémoire; les résultats sont relus depuis le disque. Une tâche interrompue (arrêt
+du serveur) reprend au redémarrage là où elle s'était arrêtée.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
+
+from dotenv import load_dotenv
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Chargement des variables d'environnement
+load_dotenv()
+
+# Configuration
+JOBS_DIR = os.getenv('JOBS_DIR', './jobs')
+JOB_CONCURRENCY = int(os.getenv('JOB_CONCURRENCY', 4))        # URLs traitées simultanément par tâche
+JOB_URL_TIMEOUT = float(os.getenv('JOB_URL_TIMEOUT', 60))     # Délai maximal de traitement d'une URL (secondes)
+
+# États d'une tâche
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"      # Interrompue par une erreur, reprise au redémarrage du serveur
+
+
+class Job:
+    """Tâche de scraping d'une liste d'URLs et progression de son traitement."""
+
+    def __init__(self, job_id: str, urls: List[str], save: bool, status: str = PENDING,
+                 created_at: Optional[float] = None, updated_at: Optional[float] = None):
+        """
+        Initialise la tâche.
+
+        Args:
+            job_id: Identifiant de la tâche
+            urls: Liste d'URLs à traiter
+            save: Si True, sauvegarde les résultats en fichiers Markdown
+            status: État de la tâche
+            created_at: Date de création (timestamp)
+            updated_at: Date de dernière mise à jour (timestamp)
+        """
+        self.id = job_id
+        self.urls = urls
+        self.save = save
+        self.status = status
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+        self.error: Optional[str] = None
+        self.completed: set = set()     # Positions des URLs traitées (résultats dans le fichier de la tâche)
+        self.success = 0                # Nombre d'URLs traitées avec succès
+        # Signalé à chaque nouveau résultat, pour le suivi en continu de la progression
+        self.updated = asyncio.Event()
+
+    def metadata(self) -> Dict[str, Any]:
+        """Description de la tâche enregistrée sur disque."""
+        return {
+            "id": self.id,
+            "urls": self.urls,
+            "save": self.save,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    def record(self, index: int, result: Dict[str, Any]) -> None:
+        """
+        Compte le résultat d'une URL dans la progression de la tâche.
+
+        Args:
+            index: Position de l'URL dans la tâche
+            result: Le résultat du traitement de l'URL
+        """
+        if index not in self.completed:
+            self.completed.add(index)
+            self.success += 1 if result["success"] else 0
+
+    def snapshot(self, results: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        État courant de la tâche.
+
+        Args:
+            results: Les résultats à transmettre, par position de l'URL (lus par JobStore.read_results)
+
+        Returns:
+            Dictionnaire contenant la progression et les résultats, dans l'ordre des URLs
+        """
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": len(self.urls),
+            "completed": len(self.completed),
+            "success": self.success,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "results": [results[index] for index in sorted(results)],
+        }
+
+    def notify(self) -> None:
+        """Réveille les clients qui suivent la progression de la tâche."""
+        self.updated_at = time.time()
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+
+class JobStore:
+    """Enregistrement des tâches et de leurs résultats sur disque."""
+
+    def __init__(self, directory: str = JOBS_DIR):
+        """
+        Initialise le stockage.
+
+        Args:
+            directory: Répertoire où enregistrer les tâches
+        """
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def metadata_path(self, job_id: str) -> str:
+        """Chemin du fichier décrivant la tâche."""
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def results_path(self, job_id: str) -> str:
+        """Chemin du fichier des résultats de la tâche."""
+        return os.path.join(self.directory, f"{job_id}.results.jsonl")
+
+    def save(self, job: Job) -> None:
+        """
+        Enregistre la description de la tâche (écriture atomique).
+
+        Args:
+            job: La tâche
+        """
+        path = self.metadata_path(job.id)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(job.metadata(), f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def append_result(self, job: Job, index: int, result: Dict[str, Any]) -> None:
+        """
+        Ajoute le résultat d'une URL au fichier de résultats de la tâche.
+
+        Args:
+            job: La tâche
+            index: Position de l'URL dans la tâche
+            result: Le résultat du traitement de l'URL
+        """
+        with open(self.results_path(job.id), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"index": index, "result": result}, ensure_ascii=False) + "\n")
+
+    def read_results(self, job_id: str, offset: int = 0) -> Tuple[Dict[int, Dict[str, Any]], int]:
+        """
+        Lit les résultats d'une tâche enregistrés à partir d'une position du fichier.
+
+        Args:
+            job_id: Identifiant de la tâche
+            offset: Position à partir de laquelle lire (celle retournée par la lecture précédente)
+
+        Returns:
+            Les résultats par position de l'URL, et la position de la fin de la dernière ligne complète lue
+        """
+        try:
+            with open(self.results_path(job_id), 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return {}, offset
+
+        # Une ligne incomplète est en cours d'écriture (ou a été interrompue): elle sera lue plus tard
+        complete_length = data.rfind(b"\n") + 1
+        results = {}
+        for line in data[:complete_length].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            results[entry["index"]] = entry["result"]
+        return results, offset + complete_length
+
+    def load(self, job_id: str) -> Optional[Job]:
+        """
+        Charge une tâche et sa progression (sans conserver ses résultats).
+
+        Args:
+            job_id: Identifiant de la tâche
+
+        Returns:
+            La tâche, ou None si elle n'existe pas
+        """
+        try:
+            with open(self.metadata_path(job_id), 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        job = Job(metadata["id"], metadata["urls"], metadata["save"], metadata["status"],
+                  metadata["created_at"], metadata["updated_at"])
+        job.error = metadata.get("error")
+
+        results, complete_length = self.read_results(job_id)
+        for index, result in results.items():
+            job.record(index, result)
+
+        if job.status != DONE:
+            # Supprimer la dernière ligne incomplète laissée par un arrêt brutal: l'URL sera retraitée
+            results_path = self.results_path(job_id)
+            if os.path.exists(results_path) and os.path.getsize(results_path) > complete_length:
+                with open(results_path, 'rb+') as f:
+                    f.truncate(complete_length)
+        return job
+
+    def list_ids(self) -> List[str]:
+        """Identifiants des tâches enregistrées."""
+        return [name[:-len(".json")] for name in os.listdir(self.directory)
+                if name.endswith(".json")]
+
+
+class JobManager:
+    """Exécute les tâches de scraping en arrière-plan et suit leur progression."""
+
+    def __init__(self, processor, scraper, store: Optional[JobStore] = None,
+                 concurrency: int = JOB_CONCURRENCY, url_timeout: float = JOB_URL_TIMEOUT):
+        """
+        Initialise le gestionnaire.
+
+        Args:
+            processor: Le WebToMarkdown qui traite les URLs
+            scraper: Le scraper asynchrone utilisé pour récupérer les pages
+            store: Le stockage des tâches (par défaut dans JOBS_DIR)
+            concurrency: Nombre d'URLs traitées simultanément par tâche
+            url_timeout: Délai maximal de traitement d'une URL, en secondes
+        """
+        self.processor = processor
+        self.scraper = scraper
+        self.store = store or JobStore()
+        self.concurrency = concurrency
+        self.url_timeout = url_timeout
+        self.jobs: Dict[str, Job] = {}      # Tâches en cours; les tâches terminées sont relues sur disque
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, urls: List[str], save: bool = True) -> Job:
+        """
+        Crée une tâche et lance son traitement en arrière-plan.
+
+        Args:
+            urls: Liste d'URLs à traiter
+            save: Si True, sauvegarde les résultats en fichiers Markdown
+
+        Returns:
+            La tâche créée
+        """
+        job = Job(uuid.uuid4().hex, urls, save)
+        self.store.save(job)
+        self.start(job)
+        logger.info(f"Tâche {job.id} créée pour {len(urls)} URLs")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Retourne une tâche en cours, ou la charge depuis le disque (sans la garder en mémoire).
+
+        Args:
+            job_id: Identifiant de la tâche
+
+        Returns:
+            La tâche, ou None si elle n'existe pas
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = self.store.load(job_id)
+        return job
+
+    async def snapshot(self, job: Job) -> Dict[str, Any]:
+        """
+        État courant d'une tâche, avec tous les résultats déjà enregistrés.
+
+        Args:
+            job: La tâche
+
+        Returns:
+            Dictionnaire contenant la progression et les résultats, dans l'ordre des URLs
+        """
+        results, _ = await asyncio.to_thread(self.store.read_results, job.id)
+        return job.snapshot(results)
+
+    def resume(self) -> int:
+        """
+        Relance les tâches inachevées enregistrées sur disque (au démarrage du serveur).
+
+        Returns:
+            Le nombre de tâches relancées
+        """
+        resumed = 0
+        for job_id in self.store.list_ids():
+            if job_id in self.jobs:
+                continue
+            job = self.store.load(job_id)
+            if job is not None and job.status != DONE:
+                logger.info(f"Reprise de la tâche {job_id} ({len(job.completed)}/{len(job.urls)} URLs déjà traitées)")
+                self.start(job)
+                resumed += 1
+        return resumed
+
+    def start(self, job: Job) -> None:
+        """Lance le traitement d'une tâche dans la boucle d'événements courante; elle reste en mémoire jusqu'à sa fin."""
+        self.jobs[job.id] = job
+        task = asyncio.create_task(self.run(job))
+        self.tasks[job.id] = task
+
+        def forget(_):
+            self.tasks.pop(job.id, None)
+            self.jobs.pop(job.id, None)
+
+        task.add_done_callback(forget)
+
+    async def run(self, job: Job) -> None:
+        """
+        Traite les URLs restantes d'une tâche, plusieurs à la fois, en enregistrant chaque résultat dès qu'il est obtenu.
+        La tâche se termine toujours dans l'état done ou failed, et ses clients en sont notifiés.
+
+        Args:
+            job: La tâche
+        """
+        job.status = RUNNING
+        job.error = None
+        try:
+            self.store.save(job)
+            await self.scraper.open()
+            await self.process_urls(job)
+            job.status = DONE
+            logger.info(f"Tâche {job.id} terminée: {job.success}/{len(job.urls)} URLs traitées avec succès")
+        except Exception as e:
+            # La tâche ne doit pas rester en cours: les clients qui la suivent attendraient indéfiniment
+            job.status = FAILED
+            job.error = str(e) or type(e).__name__
+            logger.error(f"Échec de la tâche {job.id}: {job.error}")
+        finally:
+            try:
+                self.store.save(job)
+            except OSError as e:
+                logger.error(f"Impossible d'enregistrer l'état de la tâche {job.id}: {str(e)}")
+            job.notify()
+
+    async def process_urls(self, job: Job) -> None:
+        """
+        Traite les URLs de la tâche qui n'ont pas encore de résultat, plusieurs à la fois.
+
+        Args:
+            job: La tâche
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process(index: int, url: str) -> None:
+            async with semaphore:
+                try:
+                    result = await asyncio.wait_for(
+                        self.processor.aprocess_url(url, self.scraper, save=job.save),
+                        timeout=self.url_timeout
+                    )
+                except Exception as e:
+                    logger.error(f"Erreur lors du traitement de l'URL {url}: {str(e) or type(e).__name__}")
+                    result = {
+                        "url": url,
+                        "title": None,
+                        "markdown": None,
+                        "saved": False,
+                        "saved_path": None,
+                        "success": False,
+                        "error": str(e) or f"Délai dépassé ({self.url_timeout:g} s)",
+                    }
+
+            try:
+                await asyncio.to_thread(self.store.append_result, job, index, result)
+            except OSError as e:
+                # Le résultat est compté mais n'est pas transmis; l'URL sera retraitée si la tâche est reprise
+                logger.error(f"Impossible d'enregistrer le résultat de {url} pour la tâche {job.id}: {str(e)}")
+            job.record(index, result)
+            job.notify()
+
+        await asyncio.gather(*(process(index, url) for index, url in enumerate(job.urls)
+                               if index not in job.completed))
+
+    async def follow(self, job: Job) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Suit la progression d'une tâche: produit un état à chaque nouveau résultat, jusqu'à la fin de la tâche.
+        Chaque état ne contient que les résultats qui n'ont pas encore été transmis, lus à la suite
+        des précédents dans le fichier de la tâche.
+
+        Args:
+            job: La tâche
+
+        Returns:
+            Un itérateur asynchrone sur les états de la tâche
+        """
+        offset = 0
+        while True:
+            updated = job.updated
+            # L'état est relevé avant la lecture: les derniers résultats sont enregistrés avant la fin de la tâche
+            finished = job.status in (DONE, FAILED)
+            results, offset = await asyncio.to_thread(self.store.read_results, job.id, offset)
+            yield job.snapshot(results)
+            if finished:
+                return
+            await updated.wait()
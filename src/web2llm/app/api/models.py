@@ -48,5 +48,20 @@ class ScrapeResponse(BaseModel):
 class MultipleScrapeResponse(BaseModel):
     """Modèle pour la réponse de scraping multiple."""
     total: int = Field(..., description="Nombre total d'URLs traitées")
+    success: Optional[int] = Field(None, description="Nombre d'URLs traitées avec succès (inconnu pour un traitement en arrière-plan)")
+    results: List[ScrapeResponse] = Field(..., description="Résultats pour chaque URL")
+    message: Optional[str] = Field(None, description="Message d'information éventuel")
+    job_id: Optional[str] = Field(None, description="Identifiant de la tâche pour un traitement en arrière-plan")
+
+
+class JobResponse(BaseModel):
+    """Modèle pour l'état d'une tâche de scraping en arrière-plan."""
+    id: str = Field(..., description="Identifiant de la tâche")
+    status: str = Field(..., description="État de la tâche (pending, running, done ou failed)")
+    total: int = Field(..., description="Nombre total d'URLs de la tâche")
+    completed: int = Field(..., description="Nombre d'URLs déjà traitées")
     success: int = Field(..., description="Nombre d'URLs traitées avec succès")
-    results: List[ScrapeResponse] = Field(..., description="Résultats pour chaque URL") 
\ No newline at end of file
+    error: Optional[str] = Field(None, description="Erreur ayant interrompu la tâche")
+    created_at: float = Field(..., description="Date de création (timestamp)")
+    updated_at: float = Field(..., description="Date de dernière mise à jour (timestamp)")
+    results: List[ScrapeResponse] = Field(..., description="Résultats déjà obtenus, dans l'ordre des URLs") 
\ No newline at end of file
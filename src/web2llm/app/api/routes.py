@@ -2,20 +2,123 @@
 Routes de l'API.
 """
 import os
-from typing import Dict, List, Any
+import json
+import asyncio
+from typing import Dict, List, Any, Optional, Awaitable
+from urllib.parse import quote
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from app.main import WebToMarkdown
+from app.main import WebToMarkdown, wait_to_completion
+from app.scraper.async_scraper import AsyncWebScraper
+from app.api.jobs import JobManager
 from app.api.models import (
     ScrapeRequest, ScrapeResponse, 
-    MultipleScrapeRequest, MultipleScrapeResponse
+    MultipleScrapeRequest, MultipleScrapeResponse,
+    JobResponse
 )
 
+# Nombre maximal de scrapings traités simultanément et délai maximal d'une requête (secondes)
+API_MAX_CONCURRENT_SCRAPES = int(os.getenv("API_MAX_CONCURRENT_SCRAPES", 8))
+API_SCRAPE_TIMEOUT = float(os.getenv("API_SCRAPE_TIMEOUT", 60))
+
 router = APIRouter()
 processor = WebToMarkdown()
 
+# Scraper asynchrone partagé par toutes les requêtes (pool de connexions et cache DNS communs)
+scraper = AsyncWebScraper()
+scrape_semaphore = asyncio.Semaphore(API_MAX_CONCURRENT_SCRAPES)
+
+# Tâches de scraping en arrière-plan, enregistrées sur disque
+job_manager = JobManager(processor, scraper)
+
+
+async def run_limited(work: Awaitable[Any], timeout_detail: str) -> Any:
+    """
+    Exécute un traitement en occupant une place parmi les scrapings simultanés, et répond par une
+    erreur 504 s'il dure plus de API_SCRAPE_TIMEOUT secondes.
+    La place n'est libérée qu'à la fin effective du traitement: une conversion déjà lancée dans le
+    pool de processus ne peut pas être interrompue et reste comptée après la réponse.
+    
+    Args:
+        work: Le traitement (coroutine, lancée une fois la place obtenue)
+        timeout_detail: Description du traitement pour le message d'erreur
+        
+    Returns:
+        Le résultat du traitement
+    """
+    await scraper.open()
+    await scrape_semaphore.acquire()
+    task = asyncio.ensure_future(work)
+    task.add_done_callback(lambda _: scrape_semaphore.release())
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout=API_SCRAPE_TIMEOUT)
+    except asyncio.TimeoutError:
+        task.cancel()
+        raise HTTPException(
+            status_code=504, 
+            detail=f"Délai dépassé ({API_SCRAPE_TIMEOUT:g} s) lors du scraping de {timeout_detail}"
+        )
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+
+async def run_scrape(url: str, save: bool, filename: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Traite une URL sans bloquer la boucle d'événements: la page est récupérée par le scraper
+    asynchrone et convertie dans le pool de processus, dans les limites de run_limited.
+    
+    Args:
+        url: L'URL à traiter
+        save: Si True, sauvegarde le résultat dans un fichier
+        filename: Nom du fichier pour la sauvegarde
+        
+    Returns:
+        Dictionnaire avec les résultats et le statut
+    """
+    return await run_limited(processor.aprocess_url(url, scraper, save=save, filename=filename), url)
+
+
+async def open_markdown_stream(url: str, save: bool, filename: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Récupère et nettoie une page, puis prépare sa conversion en Markdown section par section.
+    La récupération et le nettoyage sont soumis aux mêmes limites que run_scrape; la conversion
+    se fait ensuite pendant l'envoi de la réponse.
+    
+    Args:
+        url: L'URL à traiter
+        save: Si True, écrit aussi le Markdown dans un fichier pendant l'envoi
+        filename: Nom du fichier
+        
+    Returns:
+        Dictionnaire contenant le titre, le nom de fichier et l'itérateur des sections Markdown
+    """
+    async def fetch_and_clean() -> Dict[str, Any]:
+        html_content = await scraper.fetch_url(url)
+        loop = asyncio.get_running_loop()
+        return await wait_to_completion(
+            loop.run_in_executor(None, processor.stream_html, url, html_content, save, filename))
+    
+    try:
+        return await run_limited(fetch_and_clean(), url)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Erreur lors du scraping: {str(e)}"
+        )
+
+
+async def resume_jobs() -> None:
+    """Relance les tâches en arrière-plan interrompues par un arrêt du serveur (au démarrage)."""
+    job_manager.resume()
+
+
+async def close_scraper() -> None:
+    """Ferme le pool de connexions du scraper partagé (à l'arrêt du serveur)."""
+    await scraper.close()
+
 
 @router.post("/scrape", response_model=ScrapeResponse, tags=["Scraping"])
 async def scrape_url(request: ScrapeRequest) -> Dict[str, Any]:
@@ -29,7 +132,7 @@ async def scrape_url(request: ScrapeRequest) -> Dict[str, Any]:
     
     Retourne le contenu en Markdown et d'autres informations.
     """
-    result = processor.process_url(
+    result = await run_scrape(
         url=request.url, 
         save=request.save, 
         filename=request.filename
@@ -58,7 +161,7 @@ async def scrape_and_save(request: ScrapeRequest) -> Dict[str, Any]:
     # Force la sauvegarde
     request.save = True
     
-    result = processor.process_url(
+    result = await run_scrape(
         url=request.url, 
         save=True, 
         filename=request.filename
@@ -84,50 +187,46 @@ async def scrape_and_save(request: ScrapeRequest) -> Dict[str, Any]:
     }
 
 
-@router.post("/scrape/download", tags=["Scraping"])
-async def scrape_and_download(request: ScrapeRequest) -> FileResponse:
+@router.post("/scrape/stream", tags=["Scraping"])
+async def scrape_stream(request: ScrapeRequest) -> StreamingResponse:
     """
-    Scrape une URL, convertit en Markdown et renvoie directement le fichier.
+    Scrape une URL et renvoie le Markdown en flux, section par section, au fur et à mesure de la conversion.
     
     - **url**: L'URL à scraper
+    - **save**: Si True, sauvegarde aussi le résultat en fichier Markdown
     - **filename**: Nom du fichier pour la sauvegarde (optionnel)
-    - **clean**: Si True, nettoie le HTML avant conversion
     
-    Retourne directement le fichier Markdown pour téléchargement.
+    Le début du document est envoyé avant la fin de la conversion, et le Markdown complet
+    n'est jamais conservé en mémoire.
     """
-    # Force la sauvegarde
-    request.save = True
-    
-    result = processor.process_url(
-        url=request.url, 
-        save=True, 
-        filename=request.filename
-    )
+    stream = await open_markdown_stream(request.url, request.save, request.filename)
+    return StreamingResponse(stream["sections"], media_type="text/markdown; charset=utf-8")
+
+
+@router.post("/scrape/download", tags=["Scraping"])
+async def scrape_and_download(request: ScrapeRequest) -> StreamingResponse:
+    """
+    Scrape une URL, convertit en Markdown et renvoie directement le fichier.
     
-    if not result["success"]:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Erreur lors du scraping: {result.get('error', 'Erreur inconnue')}"
-        )
+    - **url**: L'URL à scraper
+    - **save**: Si True, sauvegarde aussi le fichier sur le serveur
+    - **filename**: Nom du fichier téléchargé (optionnel)
+    - **clean**: Si True, nettoie le HTML avant conversion
     
-    if not result["saved"] or not result["saved_path"]:
-        raise HTTPException(
-            status_code=500, 
-            detail="Échec de l'enregistrement du fichier"
-        )
+    Retourne directement le fichier Markdown pour téléchargement, envoyé en flux
+    au fur et à mesure de la conversion.
+    """
+    stream = await open_markdown_stream(request.url, request.save, request.filename)
     
-    return FileResponse(
-        path=result["saved_path"],
-        media_type="text/markdown",
-        filename=os.path.basename(result["saved_path"])
+    return StreamingResponse(
+        stream["sections"],
+        media_type="text/markdown; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(stream['filename'])}"}
     )
 
 
 @router.post("/scrape/multiple", response_model=MultipleScrapeResponse, tags=["Scraping multiple"])
-async def scrape_multiple_urls(
-    request: MultipleScrapeRequest, 
-    background_tasks: BackgroundTasks
-) -> Dict[str, Any]:
+async def scrape_multiple_urls(request: MultipleScrapeRequest) -> Dict[str, Any]:
     """
     Scrape plusieurs URLs en parallèle.
     
@@ -137,23 +236,48 @@ async def scrape_multiple_urls(
     Retourne les résultats pour toutes les URLs.
     """
     if len(request.urls) > 10:
-        # Pour de nombreuses URLs, traiter en arrière-plan
-        background_tasks.add_task(
-            processor.process_multiple_urls, 
-            urls=request.urls, 
-            save=request.save
-        )
+        # Pour de nombreuses URLs, traiter en arrière-plan dans une tâche dont on peut suivre la progression
+        job = job_manager.submit(urls=request.urls, save=request.save)
         return {
             "total": len(request.urls),
             "success": None,  # Inconnu car traitement en arrière-plan
             "results": [],
-            "message": f"Traitement de {len(request.urls)} URLs en arrière-plan"
+            "message": f"Traitement de {len(request.urls)} URLs en arrière-plan, suivi sur /api/jobs/{job.id}",
+            "job_id": job.id
         }
     
-    # Pour peu d'URLs, traiter immédiatement
-    result = processor.process_multiple_urls(
-        urls=request.urls, 
-        save=request.save
+    # Pour peu d'URLs, traiter immédiatement (le lot occupe une place parmi les scrapings simultanés)
+    return await run_limited(
+        processor.aprocess_multiple_urls(
+            urls=request.urls, 
+            save=request.save,
+            scraper=scraper
+        ),
+        f"{len(request.urls)} URLs"
     )
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse, tags=["Scraping multiple"])
+async def get_job(job_id: str, stream: bool = False):
+    """
+    Retourne l'état d'une tâche de scraping en arrière-plan et les résultats déjà obtenus.
+    
+    - **job_id**: Identifiant de la tâche retourné par /scrape/multiple
+    - **stream**: Si True, suit la progression en continu: une ligne JSON est envoyée
+      à chaque nouveau résultat (avec uniquement les nouveaux résultats), jusqu'à la fin de la tâche
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Tâche {job_id} introuvable"
+        )
+    
+    if not stream:
+        return await job_manager.snapshot(job)
+    
+    async def progress():
+        async for snapshot in job_manager.follow(job):
+            yield json.dumps(snapshot, ensure_ascii=False) + "\n"
     
-    return result 
\ No newline at end of file
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
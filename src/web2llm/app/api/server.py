@@ -3,13 +3,15 @@ Configuration du serveur FastAPI.
 """
 import os
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
 from app import __version__
-from app.api.routes import router
+from app.main import shutdown_process_pool
+from app.api.routes import router, resume_jobs, close_scraper
 
 # Chargement des variables d'environnement
 load_dotenv()
@@ -18,6 +20,17 @@ load_dotenv()
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", 8000))
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Relance les tâches de scraping inachevées au démarrage, puis libère à l'arrêt les ressources
+    partagées par les routes (connexions du scraper, pool de processus de conversion).
+    """
+    await resume_jobs()
+    yield
+    await close_scraper()
+    shutdown_process_pool()
+
 # Création de l'application FastAPI
 app = FastAPI(
     title="Web Scraper et Convertisseur Markdown API",
@@ -28,6 +41,7 @@ app = FastAPI(
     version=__version__,
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Configuration CORS
@@ -2,6 +2,7 @@
 Module de conversion HTML vers Markdown.
 """
 
-from src.web2llm.app.converter.converter import MarkdownConverter, html_to_markdown, save_markdown
+from src.web2llm.app.converter.converter import MarkdownConverter, html_to_markdown, save_markdown, conversion_metrics
+from src.web2llm.app.converter.renderer import MarkdownRenderer, render_markdown
 
-__all__ = ['MarkdownConverter', 'html_to_markdown', 'save_markdown'] 
\ No newline at end of file
+__all__ = ['MarkdownConverter', 'MarkdownRenderer', 'conversion_metrics', 'html_to_markdown', 'render_markdown', 'save_markdown'] 
\ No newline at end of file
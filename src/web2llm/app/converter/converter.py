@@ -2,19 +2,223 @@
 Module de conversion du HTML en Markdown.
 """
 import os
+import copy
+import html
 import logging
 import re
-from typing import Optional, Dict, Any
+import threading
+import time
+from typing import Optional, Dict, Any, Union, Iterator, Iterable, List, Callable
 from html2markdown import convert
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml.html import HtmlElement
+from lxml.html.builder import E
 import markdown
 from urllib.parse import urlparse, urljoin
 
+from src.web2llm.app.utils.html import parse_html, to_html, get_text, drop, is_element, wrap
+from src.web2llm.app.converter.renderer import MarkdownRenderer, render_markdown
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def starts_a_line(prefix: str) -> Callable[[str], bool]:
+    """Retourne un test indiquant si une ligne du texte commence par le préfixe (comme ^ en mode MULTILINE)."""
+    return lambda text: text.startswith(prefix) or f"\n{prefix}" in text
+
+
+def contains(*substrings: str) -> Callable[[str], bool]:
+    """Retourne un test indiquant si le texte contient l'une des sous-chaînes."""
+    return lambda text: any(substring in text for substring in substrings)
+
+
+def always(text: str) -> bool:
+    """Test des règles qui s'appliquent à tout texte."""
+    return True
+
+
+# Règles de nettoyage du Markdown, compilées à l'import et appliquées dans l'ordre par clean_markdown.
+# Chaque règle est accompagnée d'un test rapide (recherche de sous-chaîne) qui est faux seulement
+# si le motif ne peut pas correspondre: sauter la règle donne alors exactement le même résultat.
+CLEANING_RULES = [
+    # Supprimer les lignes vides consécutives
+    (re.compile(r'\n{3,}'), '\n\n', contains('\n\n\n')),
+    # Nettoyer les liens qui ont pu être mal convertis
+    (re.compile(r'\[(.+?)\]\s*\[\]'), r'\1', contains('[]')),
+    # Supprimer les blocs de scripts JavaScript
+    (re.compile(r'<script[^>]*>[\s\S]*?</script>'), '', contains('<script')),
+    # Supprimer les blocs de style CSS
+    (re.compile(r'<style[^>]*>[\s\S]*?</style>'), '', contains('<style')),
+    # Supprimer les blocs CDATA qui pourraient contenir du JavaScript ou CSS
+    (re.compile(r'<!\[CDATA\[[\s\S]*?\]\]>'), '', contains('<![CDATA[')),
+    # Nettoyer TOUTES les balises HTML, pas seulement certaines
+    (re.compile(r'</?[a-zA-Z][^>]*>'), '', contains('<')),
+    # Nettoyer les balises <br> et les remplacer par des sauts de ligne
+    # (seulement celles reformées par la suppression des balises précédentes, ex. "<<b>br>")
+    (re.compile(r'<br\s*/?>'), '\n', contains('<br')),
+    # Nettoyer les espaces excessifs
+    (re.compile(r' {2,}'), ' ', contains('  ')),
+    # Nettoyer les attributs HTML restants et toutes les balises avec leurs attributs
+    (re.compile(r'<([a-z0-9]+)(?:\s+[a-z0-9-]+(?:=(?:"[^"]*"|\'[^\']*\'))?)*\s*>'), '', contains('<')),
+    (re.compile(r'</[a-z0-9]+>'), '', contains('</')),
+    # Supprimer les commentaires HTML
+    (re.compile(r'<!--[\s\S]*?-->'), '', contains('<!--')),
+    # Supprimer tous les caractères d'échappement HTML comme &nbsp;
+    (re.compile(r'&[a-zA-Z]+;'), ' ', contains('&')),
+    # Supprimer les styles et scripts qui pourraient être intégrés dans des blocs de code
+    (re.compile(r'```(?:javascript|js|css|style)[\s\S]*?```'), '', contains('```')),
+    # Supprimer les lignes qui ressemblent à du CSS (propriété: valeur;)
+    (re.compile(r'^[a-z-]+:\s*[^;]+;\s*$', re.MULTILINE), '', lambda text: ':' in text and ';' in text),
+    # Supprimer les lignes qui ressemblent à des déclarations JavaScript
+    (re.compile(r'^var\s+[a-zA-Z0-9_$]+\s*=', re.MULTILINE), '', starts_a_line('var')),
+    (re.compile(r'^function\s+[a-zA-Z0-9_$]+\s*\(', re.MULTILINE), '', starts_a_line('function')),
+    (re.compile(r'^const\s+[a-zA-Z0-9_$]+\s*=', re.MULTILINE), '', starts_a_line('const')),
+    (re.compile(r'^let\s+[a-zA-Z0-9_$]+\s*=', re.MULTILINE), '', starts_a_line('let')),
+    # Supprimer les accolades isolées qui pourraient provenir de code
+    (re.compile(r'^\s*[{}]\s*$', re.MULTILINE), '', contains('{', '}')),
+    # Supprimer les doubles espaces après avoir enlevé les balises
+    (re.compile(r' {2,}'), ' ', contains('  ')),
+    # Nettoyer les lignes vides multiples qui peuvent être créées après suppression des balises
+    (re.compile(r'\n{3,}'), '\n\n', contains('\n\n\n')),
+    # Supprimer les lignes qui ne contiennent que des caractères non significatifs
+    (re.compile(r'^\s*[;:.,_\-*+#]+\s*$', re.MULTILINE), '', always),
+]
+
+# Choix de la méthode de conversion
+HTML2MARKDOWN = "html2markdown"
+RENDERER = "renderer"
+HTML2MARKDOWN_FALLBACK = "html2markdown+renderer"  # html2markdown a laissé des balises, rendu direct ensuite
+# Balises converties par html2markdown, avec les seuls attributs qu'il accepte: les autres balises de bloc
+# (div, section, table...) et les balises portant d'autres attributs sont laissées en HTML brut, sans
+# conversion de leur contenu
+HTML2MARKDOWN_TAGS = {'blockquote', 'p', 'a', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'b',
+                      'em', 'i', 'ul', 'ol', 'li', 'br', 'img', 'pre', 'code', 'hr'}
+HTML2MARKDOWN_ATTRIBUTES = {'a': {'href', 'title'}, 'img': {'alt', 'src', 'title'}}
+# Balises en ligne laissées telles quelles par html2markdown puis supprimées par clean_markdown (texte conservé)
+PASSTHROUGH_TAGS = {'span', 'abbr', 'acronym', 'cite', 'del', 'dfn', 'ins', 'kbd', 'mark', 'q', 's',
+                    'samp', 'small', 'sub', 'sup', 'time', 'u', 'var', 'big', 'bdi', 'bdo', 'data'}
+
+def estimate_markup(elements: Iterable[HtmlElement]) -> Dict[str, int]:
+    """
+    Estime la complexité du balisage d'un contenu, en un seul parcours de ses éléments.
+    
+    Args:
+        elements: Les éléments racines du contenu
+        
+    Returns:
+        Dictionnaire contenant le nombre d'éléments, d'éléments que html2markdown ne convertit pas,
+        de tableaux et de blocs de code
+    """
+    stats = {"elements": 0, "unsupported": 0, "tables": 0, "code_blocks": 0}
+    for root in elements:
+        for element in root.iter(etree.Element):
+            tag = element.tag
+            stats["elements"] += 1
+            if tag == 'table':
+                stats["tables"] += 1
+            elif tag == 'pre':
+                stats["code_blocks"] += 1
+            if tag in HTML2MARKDOWN_TAGS:
+                if element.attrib and not set(element.attrib) <= HTML2MARKDOWN_ATTRIBUTES.get(tag, set()):
+                    stats["unsupported"] += 1
+            elif tag not in PASSTHROUGH_TAGS:
+                stats["unsupported"] += 1
+    return stats
+
+def choose_converter(stats: Dict[str, int]) -> str:
+    """
+    Choisit la méthode de conversion d'un contenu d'après l'estimation de son balisage.
+    html2markdown ne convertit correctement que le balisage simple: il ne gère pas les tableaux,
+    laisse en HTML brut tout élément qu'il ne reconnaît pas (le contenu perd alors sa structure une
+    fois les balises supprimées par clean_markdown) et produit des blocs de code indentés dont
+    clean_markdown réduit l'indentation. Le rendu direct de l'arbre, dont le résultat n'est que
+    normalisé (normalize_markdown), est utilisé dans tous ces cas.
+    
+    Args:
+        stats: L'estimation produite par estimate_markup
+        
+    Returns:
+        HTML2MARKDOWN ou RENDERER
+    """
+    if stats["unsupported"] or stats["tables"] or stats["code_blocks"]:
+        return RENDERER
+    return HTML2MARKDOWN
+
+
+class ConversionMetrics:
+    """
+    Compteurs des conversions en Markdown par méthode: nombre de conversions et durée cumulée.
+    Partagés par les threads d'un processus (chaque processus de calcul a ses propres compteurs).
+    """
+    
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, method: str, seconds: float) -> None:
+        """
+        Enregistre une conversion.
+        
+        Args:
+            method: La méthode utilisée
+            seconds: La durée de la conversion (nettoyage compris)
+        """
+        with self._lock:
+            self.counts[method] = self.counts.get(method, 0) + 1
+            self.seconds[method] = self.seconds.get(method, 0.0) + seconds
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Nombre, part, durée cumulée et durée moyenne des conversions de chaque méthode."""
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                method: {
+                    "count": count,
+                    "share": count / total,
+                    "seconds": self.seconds[method],
+                    "average_ms": self.seconds[method] / count * 1000,
+                }
+                for method, count in self.counts.items()
+            }
+
+
+conversion_metrics = ConversionMetrics()
+
+# Découpage en sections pour la conversion en flux
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+CONTAINER_TAGS = {'div', 'article', 'section', 'main', 'header', 'footer', 'aside', 'form', 'center'}
+MAX_SECTION_BLOCKS = 50  # Nombre maximal de blocs par section (pages sans titres)
+
+def iter_blocks(element: HtmlElement) -> Iterator[Union[HtmlElement, str]]:
+    """
+    Parcourt le contenu d'un élément sous forme de blocs consécutifs, dans l'ordre du document.
+    Les conteneurs qui renferment des titres sont ouverts pour que chaque titre soit un bloc;
+    les autres éléments sont des blocs indivisibles (leur texte suivant inclus).
+    
+    Args:
+        element: L'élément à parcourir
+        
+    Returns:
+        Un itérateur sur les blocs (éléments) et les textes situés entre eux
+    """
+    if element.text:
+        yield element.text
+    for child in element:
+        if not is_element(child):
+            if child.tail:
+                yield child.tail
+            continue
+        if child.tag in CONTAINER_TAGS and next(child.iterdescendants(*HEADING_TAGS), None) is not None:
+            yield from iter_blocks(child)
+            if child.tail:
+                yield child.tail
+        else:
+            yield child
+
+
 class MarkdownConverter:
     """Classe pour convertir le HTML en Markdown avec options de nettoyage avancées."""
     
@@ -27,110 +231,113 @@ class MarkdownConverter:
         """
         self.base_url = base_url
     
-    def fix_relative_urls(self, html_content: str, base_url: Optional[str] = None) -> str:
+    def fix_relative_urls(self, html_content: Union[str, HtmlElement], base_url: Optional[str] = None) -> HtmlElement:
         """
         Remplace les URLs relatives par des URLs absolues.
         
         Args:
-            html_content: Le contenu HTML
+            html_content: Le contenu HTML ou son arbre lxml (modifié en place)
             base_url: L'URL de base pour résoudre les liens relatifs
             
         Returns:
-            HTML avec liens absolus
+            Arbre lxml avec liens absolus
         """
+        doc = parse_html(html_content) if isinstance(html_content, str) else html_content
+        
         if not base_url and not self.base_url:
-            return html_content
+            return doc
             
         url_to_use = base_url if base_url else self.base_url
         
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
         # Corriger les liens
-        for a_tag in soup.find_all('a', href=True):
-            if not a_tag['href'].startswith(('http://', 'https://', 'mailto:', 'tel:', '#')):
-                a_tag['href'] = urljoin(url_to_use, a_tag['href'])
+        for a_tag in doc.iter('a'):
+            href = a_tag.get('href')
+            if href is not None and not href.startswith(('http://', 'https://', 'mailto:', 'tel:', '#')):
+                a_tag.set('href', urljoin(url_to_use, href))
         
         # Corriger les images
-        for img_tag in soup.find_all('img', src=True):
-            if not img_tag['src'].startswith(('http://', 'https://', 'data:')):
-                img_tag['src'] = urljoin(url_to_use, img_tag['src'])
+        for img_tag in doc.iter('img'):
+            src = img_tag.get('src')
+            if src is not None and not src.startswith(('http://', 'https://', 'data:')):
+                img_tag.set('src', urljoin(url_to_use, src))
         
-        return str(soup)
+        return doc
     
-    def pre_process_html(self, html_content: str) -> str:
+    def pre_process_html(self, html_content: Union[str, HtmlElement]) -> HtmlElement:
         """
         Pré-traitement du HTML pour améliorer la conversion en Markdown.
         
         Args:
-            html_content: Le contenu HTML
+            html_content: Le contenu HTML ou son arbre lxml (modifié en place)
             
         Returns:
-            HTML pré-traité
+            Arbre lxml pré-traité
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
+        doc = parse_html(html_content) if isinstance(html_content, str) else html_content
         
         # Supprimer tous les scripts et styles - Première passe critique
-        for element in soup.find_all(['script', 'style', 'noscript', 'iframe']):
-            element.decompose()
+        for element in list(doc.iter('script', 'style', 'noscript', 'iframe')):
+            drop(element)
         
         # Supprimer les attributs JavaScript inline et styles
-        for tag in soup.find_all(True):
+        for tag in doc.iter(etree.Element):
             # Liste pour stocker les attributs à supprimer
             attrs_to_remove = []
             
-            for attr in tag.attrs:
+            for attr in tag.attrib:
                 # Supprimer style et attributs JavaScript
                 if attr == 'style' or attr.startswith('on'):
                     attrs_to_remove.append(attr)
             
             # Supprimer les attributs identifiés
             for attr in attrs_to_remove:
-                del tag[attr]
+                del tag.attrib[attr]
         
         # Convertir les divs qui se comportent comme des paragraphes en paragraphes réels
-        for div in soup.find_all('div'):
-            if not div.find(['div', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'ul', 'ol']):
-                div.name = 'p'
+        for div in list(doc.iter('div')):
+            if next(div.iterdescendants('div', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'table', 'ul', 'ol'), None) is None:
+                div.tag = 'p'
         
         # S'assurer que les listes sont correctement formatées
-        for ul in soup.find_all(['ul', 'ol']):
-            for child in ul.children:
-                if child.name != 'li' and child.name is not None:
+        for ul in list(doc.iter('ul', 'ol')):
+            for child in list(ul):
+                if is_element(child) and child.tag != 'li':
                     # Convertir ou envelopper dans un li
-                    if child.string and child.string.strip():
-                        new_li = soup.new_tag('li')
-                        child.wrap(new_li)
+                    if len(child) == 0 and child.text and child.text.strip():
+                        wrap(child, E.li())
         
         # Traiter les tableaux pour une meilleure conversion
-        for table in soup.find_all('table'):
+        for table in list(doc.iter('table')):
             # S'assurer que chaque tableau a un thead et tbody
-            if not table.find('thead'):
-                thead = soup.new_tag('thead')
-                first_tr = table.find('tr')
-                if first_tr:
-                    first_tr.wrap(thead)
+            if next(table.iterdescendants('thead'), None) is None:
+                first_tr = next(table.iterdescendants('tr'), None)
+                if first_tr is not None:
+                    wrap(first_tr, E.thead())
             
             # S'assurer que tbody existe
-            if not table.find('tbody'):
-                tbody = soup.new_tag('tbody')
-                for tr in table.find_all('tr')[1:]:
-                    tr.wrap(tbody)
+            if next(table.iterdescendants('tbody'), None) is None:
+                rows = list(table.iterdescendants('tr'))[1:]
+                if rows:
+                    # Comme avec BeautifulSoup, le tbody prend la place de la dernière ligne
+                    tbody = E.tbody()
+                    rows[-1].addprevious(tbody)
+                    for tr in rows:
+                        tail, tr.tail = tr.tail, None
+                        tbody.append(tr)
+                    tbody.tail = tail
         
         # Nettoyer les balises span inutiles
-        for span in soup.find_all('span'):
-            if not span.attrs:  # Si span n'a pas d'attributs
-                span.unwrap()
-        
-        # Supprimer les objets JavaScript/Flash/etc.
-        for obj in soup.find_all(['object', 'embed']):
-            obj.decompose()
+        for span in list(doc.iter('span')):
+            if not span.attrib:  # Si span n'a pas d'attributs
+                span.drop_tag()
         
-        # Supprimer les formulaires (souvent inutiles pour l'extraction de contenu)
-        for form in soup.find_all('form'):
-            form.decompose()
+        # Supprimer les objets JavaScript/Flash/etc. et les formulaires
+        # (souvent inutiles pour l'extraction de contenu)
+        for element in list(doc.iter('object', 'embed', 'form')):
+            drop(element)
         
-        # Retourner le HTML pré-traité
-        return str(soup)
+        # Retourner l'arbre pré-traité
+        return doc
     
     def clean_markdown(self, markdown_content: str) -> str:
         """
@@ -142,200 +349,180 @@ class MarkdownConverter:
         Returns:
             Markdown nettoyé
         """
-        # Supprimer les lignes vides consécutives
-        markdown_content = re.sub(r'\n{3,}', '\n\n', markdown_content)
-        
-        # Nettoyer les liens qui ont pu être mal convertis
-        markdown_content = re.sub(r'\[(.+?)\]\s*\[\]', r'\1', markdown_content)
-        
-        # Supprimer les blocs de scripts JavaScript
-        markdown_content = re.sub(r'<script[^>]*>[\s\S]*?</script>', '', markdown_content)
-        
-        # Supprimer les blocs de style CSS
-        markdown_content = re.sub(r'<style[^>]*>[\s\S]*?</style>', '', markdown_content)
-        
-        # Supprimer les blocs CDATA qui pourraient contenir du JavaScript ou CSS
-        markdown_content = re.sub(r'<!\[CDATA\[[\s\S]*?\]\]>', '', markdown_content)
-        
-        # Nettoyer TOUTES les balises HTML, pas seulement certaines
-        markdown_content = re.sub(r'</?[a-zA-Z][^>]*>', '', markdown_content)
-        
-        # Nettoyer les balises <br> et les remplacer par des sauts de ligne
-        markdown_content = re.sub(r'<br\s*/?>',  '\n', markdown_content)
-        
-        # Nettoyer les espaces excessifs
-        markdown_content = re.sub(r' {2,}', ' ', markdown_content)
-        
-        # Nettoyer les attributs HTML restants et toutes les balises avec leurs attributs
-        markdown_content = re.sub(r'<([a-z0-9]+)(?:\s+[a-z0-9-]+(?:=(?:"[^"]*"|\'[^\']*\'))?)*\s*>', '', markdown_content)
-        markdown_content = re.sub(r'</[a-z0-9]+>', '', markdown_content)
-        
-        # Supprimer les commentaires HTML
-        markdown_content = re.sub(r'<!--[\s\S]*?-->', '', markdown_content)
-        
-        # Supprimer tous les caractères d'échappement HTML comme &nbsp;
-        markdown_content = re.sub(r'&[a-zA-Z]+;', ' ', markdown_content)
-        
-        # Supprimer les styles et scripts qui pourraient être intégrés dans des blocs de code
-        markdown_content = re.sub(r'```(?:javascript|js|css|style)[\s\S]*?```', '', markdown_content)
-        
-        # Supprimer les lignes qui ressemblent à du CSS (propriété: valeur;)
-        markdown_content = re.sub(r'^[a-z-]+:\s*[^;]+;\s*$', '', markdown_content, flags=re.MULTILINE)
-        
-        # Supprimer les lignes qui ressemblent à des déclarations JavaScript
-        markdown_content = re.sub(r'^var\s+[a-zA-Z0-9_$]+\s*=', '', markdown_content, flags=re.MULTILINE)
-        markdown_content = re.sub(r'^function\s+[a-zA-Z0-9_$]+\s*\(', '', markdown_content, flags=re.MULTILINE)
-        markdown_content = re.sub(r'^const\s+[a-zA-Z0-9_$]+\s*=', '', markdown_content, flags=re.MULTILINE)
-        markdown_content = re.sub(r'^let\s+[a-zA-Z0-9_$]+\s*=', '', markdown_content, flags=re.MULTILINE)
-        
-        # Supprimer les accolades isolées qui pourraient provenir de code
-        markdown_content = re.sub(r'^\s*[{}]\s*$', '', markdown_content, flags=re.MULTILINE)
-        
-        # Supprimer les doubles espaces après avoir enlevé les balises
-        markdown_content = re.sub(r' {2,}', ' ', markdown_content)
-        
-        # Nettoyer les lignes vides multiples qui peuvent être créées après suppression des balises
-        markdown_content = re.sub(r'\n{3,}', '\n\n', markdown_content)
-        
-        # Supprimer les lignes qui ne contiennent que des caractères non significatifs
-        markdown_content = re.sub(r'^\s*[;:.,_\-*+#]+\s*$', '', markdown_content, flags=re.MULTILINE)
+        # Les règles sont appliquées dans l'ordre; celles dont le motif ne peut pas apparaître
+        # dans le texte sont sautées sans parcourir le texte avec l'expression régulière
+        for pattern, replacement, applies in CLEANING_RULES:
+            if applies(markdown_content):
+                markdown_content = pattern.sub(replacement, markdown_content)
         
         return markdown_content.strip()
     
-    def html_to_markdown(self, html_content: str, url: Optional[str] = None) -> str:
+    def normalize_markdown(self, markdown_content: str) -> str:
+        """
+        Normalise le Markdown produit par le rendu direct de l'arbre (MarkdownRenderer).
+        Ce Markdown ne contient pas de balises HTML à supprimer: contrairement à clean_markdown, seuls les
+        espaces en fin de ligne et les lignes vides consécutives sont réduits, et uniquement hors des
+        blocs de code, dont le contenu (indentation, accolades, texte ressemblant à du HTML) est conservé.
+        
+        Args:
+            markdown_content: Le contenu Markdown
+            
+        Returns:
+            Markdown normalisé
+        """
+        lines = []
+        in_code_block = False
+        previous_blank = False
+        for line in markdown_content.split('\n'):
+            # Les délimiteurs des blocs de code peuvent être préfixés (citations, éléments de liste)
+            if line.lstrip(' >').startswith('```'):
+                in_code_block = not in_code_block
+            elif in_code_block:
+                lines.append(line)
+                continue
+            
+            line = line.rstrip()
+            blank = not line.lstrip(' >')
+            if blank and previous_blank:
+                continue
+            previous_blank = blank
+            lines.append(line)
+        
+        return '\n'.join(lines).strip()
+    
+    def html_to_markdown(self, html_content: Union[str, HtmlElement], url: Optional[str] = None) -> str:
         """
         Convertit le HTML en Markdown.
+        Le pré-traitement, la correction des liens et la conversion travaillent sur un seul
+        arbre lxml, qui peut être fourni déjà parsé (il n'est pas modifié). Une seule méthode
+        de conversion est utilisée, choisie d'après une estimation du balisage (choose_converter).
         
         Args:
-            html_content: Le contenu HTML
+            html_content: Le contenu HTML ou son arbre lxml
             url: L'URL source pour résoudre les liens relatifs
             
         Returns:
             Contenu au format Markdown
         """
         try:
+            if isinstance(html_content, str):
+                doc = parse_html(html_content)
+            else:
+                doc = copy.deepcopy(html_content)
+            
             # Pré-traiter le HTML
-            html_content = self.pre_process_html(html_content)
+            doc = self.pre_process_html(doc)
             
             # Fixer les URLs relatives si une URL est fournie
             base_url = url or self.base_url
             if base_url:
-                html_content = self.fix_relative_urls(html_content, base_url)
-            
-            # Approche 1: Utiliser html2markdown (la bibliothèque standard)
-            markdown_content_1 = convert(html_content)
-            markdown_content_1 = self.clean_markdown(markdown_content_1)
-            
-            # Si le résultat semble bon, on le retourne
-            if not ('<' in markdown_content_1 and '>' in markdown_content_1):
-                return markdown_content_1
-            
-            # Approche 2: Extraction directe avec BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
-            content_parts = []
-            
-            # Ajouter le titre
-            if soup.title:
-                content_parts.append(f"# {soup.title.string.strip()}\n\n")
-            
-            # Ajouter les titres et sous-titres
-            for i in range(1, 7):
-                for header in soup.find_all(f'h{i}'):
-                    content_parts.append(f"{'#' * i} {header.get_text().strip()}\n\n")
+                doc = self.fix_relative_urls(doc, base_url)
             
-            # Ajouter les paragraphes
-            for p in soup.find_all('p'):
-                text = p.get_text().strip()
-                if text:
-                    content_parts.append(f"{text}\n\n")
+            # Une seule méthode de conversion, choisie d'après le balisage du contenu
+            body = doc.find('body')
+            content = list(body) if body is not None else [doc]
+            started = time.perf_counter()
+            method = choose_converter(estimate_markup(content))
             
-            # Ajouter les listes non ordonnées
-            for ul in soup.find_all('ul'):
-                for li in ul.find_all('li'):
-                    content_parts.append(f"* {li.get_text().strip()}\n")
-                content_parts.append("\n")
+            if method == HTML2MARKDOWN:
+                # Approche 1: html2markdown, sur le contenu du corps (qu'il ne convertirait pas sinon)
+                title = doc.find('.//title')
+                title_text = get_text(title).strip() if title is not None else ''
+                heading = f"# {title_text}\n\n" if title_text else ''
+                inner_html = html.escape(body.text or '', quote=False) if body is not None else ''
+                markdown_content = self.clean_markdown(heading + convert(inner_html + ''.join(to_html(e) for e in content)))
+                # Des balises restantes indiquent une conversion incomplète: rendu direct de l'arbre
+                if '<' in markdown_content and '>' in markdown_content:
+                    method = HTML2MARKDOWN_FALLBACK
             
-            # Ajouter les listes ordonnées
-            for ol in soup.find_all('ol'):
-                for i, li in enumerate(ol.find_all('li')):
-                    content_parts.append(f"{i+1}. {li.get_text().strip()}\n")
-                content_parts.append("\n")
+            if method != HTML2MARKDOWN:
+                # Approche 2: Rendu direct de l'arbre, en un seul parcours et dans l'ordre du document
+                markdown_content = self.normalize_markdown(render_markdown(doc))
             
-            # Ajouter les tableaux (version simple)
-            for table in soup.find_all('table'):
-                for tr in table.find_all('tr'):
-                    row = []
-                    for cell in tr.find_all(['td', 'th']):
-                        row.append(cell.get_text().strip())
-                    if row:
-                        content_parts.append("| " + " | ".join(row) + " |\n")
-                content_parts.append("\n")
-            
-            # Ajouter les citations
-            for blockquote in soup.find_all('blockquote'):
-                lines = blockquote.get_text().strip().split('\n')
-                for line in lines:
-                    if line.strip():
-                        content_parts.append(f"> {line.strip()}\n")
-                content_parts.append("\n")
-            
-            # Ajouter les blocs de code
-            for pre in soup.find_all('pre'):
-                content_parts.append("```\n")
-                content_parts.append(pre.get_text().strip() + "\n")
-                content_parts.append("```\n\n")
-            
-            # Ajouter les images
-            for img in soup.find_all('img'):
-                alt = img.get('alt', '')
-                src = img.get('src', '')
-                if src:
-                    content_parts.append(f"![{alt}]({src})\n\n")
-            
-            # Ajouter les liens
-            for a in soup.find_all('a'):
-                text = a.get_text().strip()
-                href = a.get('href', '')
-                if href and text:
-                    content_parts.append(f"[{text}]({href})\n\n")
-            
-            # Autres blocs de texte significatifs
-            for div in soup.find_all(['div', 'article', 'section', 'main']):
-                # Éviter les div qui contiennent déjà des éléments traités
-                if not div.find(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'ul', 'ol', 'table']):
-                    text = div.get_text().strip()
-                    if len(text) > 100:  # Contenu significatif
-                        content_parts.append(f"{text}\n\n")
-            
-            markdown_content_2 = ''.join(content_parts)
-            
-            # Approche 3: Extraction de texte brut en dernier recours
-            if not markdown_content_2 or len(markdown_content_2) < 200:
-                markdown_content_3 = soup.get_text(separator='\n\n', strip=True)
-                # Nettoyer et structurer le texte brut
-                paragraphs = [p.strip() for p in markdown_content_3.split('\n\n') if p.strip()]
-                markdown_content_3 = '\n\n'.join(paragraphs)
-                
-                # Si cette approche donne un meilleur résultat, l'utiliser
-                if len(markdown_content_3) > len(markdown_content_2):
-                    markdown_content_2 = markdown_content_3
-            
-            # Nettoyer le résultat final
-            markdown_content_2 = self.clean_markdown(markdown_content_2)
-            
-            # Sélectionner la meilleure approche
-            if len(markdown_content_1) > len(markdown_content_2) and '<' not in markdown_content_1:
-                return markdown_content_1
-            else:
-                return markdown_content_2
+            conversion_metrics.record(method, time.perf_counter() - started)
+            return markdown_content
                 
         except Exception as e:
             logger.error(f"Erreur lors de la conversion en Markdown: {str(e)}")
             # Fallback: extraction simple du texte
-            soup = BeautifulSoup(html_content, 'html.parser')
-            text = soup.get_text(separator='\n\n', strip=True)
+            try:
+                doc = parse_html(html_content) if isinstance(html_content, str) else html_content
+                text = get_text(doc, separator='\n\n', strip=True)
+            except Exception:
+                text = html_content if isinstance(html_content, str) else ''
             return self.clean_markdown(text)
     
+    def iter_markdown(self, html_content: Union[str, HtmlElement], url: Optional[str] = None) -> Iterator[str]:
+        """
+        Convertit le HTML en Markdown section par section, en produisant chaque section dès
+        qu'elle est convertie. Une section commence à chaque titre (h1 à h6) du contenu,
+        de sorte que le début du document est disponible avant la fin de la conversion et que
+        le Markdown complet n'est jamais conservé en mémoire.
+        
+        Args:
+            html_content: Le contenu HTML ou son arbre lxml (il n'est pas modifié)
+            url: L'URL source pour résoudre les liens relatifs
+            
+        Returns:
+            Un itérateur sur les sections Markdown
+        """
+        if isinstance(html_content, str):
+            doc = parse_html(html_content)
+        else:
+            doc = copy.deepcopy(html_content)
+        
+        doc = self.pre_process_html(doc)
+        base_url = url or self.base_url
+        if base_url:
+            doc = self.fix_relative_urls(doc, base_url)
+        
+        body = doc.find('body')
+        section: List[Union[HtmlElement, str]] = []
+        block_count = 0
+        for block in iter_blocks(body if body is not None else doc):
+            if isinstance(block, str):
+                section.append(block)
+                continue
+            if block_count and (block.tag in HEADING_TAGS or block_count >= MAX_SECTION_BLOCKS):
+                markdown_section = self.convert_section(section)
+                if markdown_section:
+                    yield markdown_section
+                section, block_count = [], 0
+            section.append(block)
+            block_count += 1
+        
+        markdown_section = self.convert_section(section)
+        if markdown_section:
+            yield markdown_section
+    
+    def convert_section(self, blocks: List[Union[HtmlElement, str]]) -> str:
+        """
+        Convertit une suite de blocs consécutifs en Markdown, avec la méthode choisie d'après leur balisage.
+        
+        Args:
+            blocks: Les blocs de la section (éléments, avec le texte qui les suit, et textes entre eux)
+            
+        Returns:
+            La section au format Markdown, terminée par une ligne vide (vide si la section n'a pas de contenu)
+        """
+        elements = [block for block in blocks if not isinstance(block, str)]
+        if not elements and not ''.join(blocks).strip():
+            return ''
+        
+        started = time.perf_counter()
+        method = choose_converter(estimate_markup(elements))
+        if method == HTML2MARKDOWN:
+            html_section = ''.join(html.escape(block, quote=False) if isinstance(block, str) else to_html(block)
+                                   for block in blocks)
+            markdown_section = self.clean_markdown(convert(html_section))
+            if '<' in markdown_section and '>' in markdown_section:
+                method = HTML2MARKDOWN_FALLBACK
+        if method != HTML2MARKDOWN:
+            markdown_section = self.normalize_markdown(MarkdownRenderer().render_blocks(blocks))
+        conversion_metrics.record(method, time.perf_counter() - started)
+        
+        return f"{markdown_section}\n\n" if markdown_section else ''
+    
     def save_markdown(self, markdown_content: str, filepath: str) -> bool:
         """
         Enregistre le contenu Markdown dans un fichier.
@@ -378,12 +565,12 @@ class MarkdownConverter:
 
 
 # Fonctions utilitaires pour une utilisation rapide
-def html_to_markdown(html_content: str, url: Optional[str] = None) -> str:
+def html_to_markdown(html_content: Union[str, HtmlElement], url: Optional[str] = None) -> str:
     """
     Fonction utilitaire pour convertir HTML en Markdown.
     
     Args:
-        html_content: Le contenu HTML
+        html_content: Le contenu HTML ou son arbre lxml
         url: L'URL source pour résoudre les liens relatifs
         
     Returns:
@@ -0,0 +1,295 @@
+"""
+Rendu Markdown direct d'un arbre lxml.
+
+L'arbre est parcouru une seule fois, dans l'ordre du document, et le Markdown est construit
+par ajouts successifs dans une liste de fragments assemblée à la fin.
+"""
+import re
+from typing import List, Optional, Union
+
+from lxml.html import HtmlElement
+
+from src.web2llm.app.utils.html import get_text, is_element
+
+# Balises dont le contenu n'est pas rendu
+SKIPPED_TAGS = {'head', 'script', 'style', 'noscript', 'template', 'iframe', 'object', 'embed',
+                'svg', 'canvas', 'button', 'select', 'input', 'textarea'}
+# Balises de bloc: leur contenu est séparé du reste par une ligne vide
+BLOCK_TAGS = {'p', 'div', 'section', 'article', 'main', 'header', 'footer', 'aside', 'nav',
+              'address', 'figure', 'figcaption', 'form', 'fieldset', 'details', 'summary',
+              'center', 'dl', 'caption', 'body', 'html'}
+# Balises de bloc séparées par un simple saut de ligne
+LINE_TAGS = {'dt', 'dd'}
+HEADING_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+EMPHASIS_MARKERS = {'strong': '**', 'b': '**', 'em': '*', 'i': '*', 'del': '~~', 's': '~~', 'strike': '~~'}
+TABLE_SECTION_TAGS = {'thead', 'tbody', 'tfoot'}
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class MarkdownRenderer:
+    """
+    Convertit un arbre lxml en Markdown en un seul parcours.
+    Titres, paragraphes, listes (imbriquées), citations, blocs de code, tableaux, liens,
+    images et mises en valeur sont rendus à leur position dans le document.
+    La profondeur de récursion est bornée par celle de l'arbre, que libxml2 limite à 255.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []        # Fragments du Markdown produit
+        self.prefixes: List[str] = []     # Préfixes des lignes (citations, continuation des éléments de liste)
+        self.breaks = 0                   # Sauts de ligne à produire avant le prochain contenu
+        self.break_depth = 0              # Nombre de préfixes conservés sur les lignes vides
+        self.space = False                # Espace à produire avant le prochain contenu
+        self.line_start = True            # Le prochain contenu commence une ligne
+        self.after_marker = False         # Rien n'a été écrit depuis la puce d'un élément de liste
+        self.list_depth = 0
+
+    def render(self, element: HtmlElement, include_title: bool = True) -> str:
+        """
+        Rend un document ou un élément en Markdown.
+
+        Args:
+            element: Le document ou l'élément à rendre
+            include_title: Si True, commence par le titre du document (<title>) s'il existe
+
+        Returns:
+            Le contenu au format Markdown
+        """
+        if include_title:
+            title = element.find('.//title')
+            if title is not None and get_text(title).strip():
+                self.block()
+                self.write('# ')
+                self.write_text(get_text(title))
+                self.block()
+        self.render_element(element)
+        return ''.join(self.parts).strip() + '\n'
+
+    def render_blocks(self, blocks: List[Union[HtmlElement, str]]) -> str:
+        """
+        Rend une suite de blocs consécutifs d'un document (section de MarkdownConverter.iter_markdown).
+
+        Args:
+            blocks: Les éléments, dont le texte suivant fait partie du bloc, et les textes entre eux
+
+        Returns:
+            Le contenu au format Markdown
+        """
+        for block in blocks:
+            if isinstance(block, str):
+                self.write_text(block)
+            else:
+                if is_element(block):
+                    self.render_element(block)
+                self.write_text(block.tail)
+        return ''.join(self.parts).strip() + '\n'
+
+    def render_inline(self, element: HtmlElement) -> str:
+        """
+        Rend le contenu d'un élément sur une seule ligne (libellé d'un lien, cellule de tableau).
+
+        Args:
+            element: L'élément
+
+        Returns:
+            Le contenu au format Markdown, sans sauts de ligne
+        """
+        renderer = MarkdownRenderer()
+        renderer.render_children(element)
+        return WHITESPACE_PATTERN.sub(' ', ''.join(renderer.parts)).strip()
+
+    # Construction du texte
+
+    def block(self, breaks: int = 2) -> None:
+        """Termine le bloc courant: le prochain contenu sera précédé de sauts de ligne."""
+        if self.parts and not self.after_marker:
+            # Les lignes vides ne portent que les préfixes communs aux deux blocs qu'elles séparent
+            self.break_depth = min(self.break_depth, len(self.prefixes)) if self.breaks else len(self.prefixes)
+            self.breaks = max(self.breaks, breaks)
+        self.space = False
+
+    def write(self, content: str) -> None:
+        """Ajoute du contenu, précédé des sauts de ligne, préfixes et espace en attente."""
+        if self.breaks:
+            line_prefix = ''.join(self.prefixes[:min(self.break_depth, len(self.prefixes))])
+            self.parts.append(('\n' + line_prefix.rstrip()) * (self.breaks - 1) + '\n')
+            self.breaks = 0
+            self.line_start = True
+        if self.line_start:
+            self.parts.append(''.join(self.prefixes))
+            self.line_start = False
+        elif self.space:
+            self.parts.append(' ')
+        self.space = False
+        self.after_marker = False
+        self.parts.append(content)
+
+    def write_text(self, text: Optional[str]) -> None:
+        """Ajoute un texte du document, en réduisant ses espaces comme un navigateur."""
+        if not text:
+            return
+        collapsed = WHITESPACE_PATTERN.sub(' ', text)
+        if collapsed[0] == ' ':
+            self.space = True
+        words = collapsed.strip()
+        if words:
+            self.write(words)
+            self.space = collapsed[-1] == ' '
+
+    def write_lines(self, text: str) -> None:
+        """Ajoute un texte ligne par ligne, sans réduire ses espaces (blocs de code)."""
+        for index, line in enumerate(text.split('\n')):
+            if index:
+                self.block(1)
+            self.write(line)
+
+    # Parcours de l'arbre
+
+    def render_children(self, element: HtmlElement) -> None:
+        """Rend le texte et les enfants d'un élément, dans l'ordre du document."""
+        self.write_text(element.text)
+        for child in element:
+            if is_element(child):
+                self.render_element(child)
+            self.write_text(child.tail)
+
+    def render_element(self, element: HtmlElement) -> None:
+        """Rend un élément selon sa balise (sans le texte qui le suit)."""
+        tag = element.tag
+        if tag in SKIPPED_TAGS:
+            return
+
+        if tag in HEADING_LEVELS:
+            text = self.render_inline(element)
+            if text:
+                self.block()
+                self.write(f"{'#' * HEADING_LEVELS[tag]} {text}")
+                self.block()
+        elif tag in BLOCK_TAGS:
+            self.block()
+            self.render_children(element)
+            self.block()
+        elif tag in LINE_TAGS or tag == 'li':
+            self.block(1)
+            self.render_children(element)
+            self.block(1)
+        elif tag in ('ul', 'ol'):
+            self.render_list(element)
+        elif tag == 'blockquote':
+            self.block()
+            self.prefixes.append('> ')
+            self.render_children(element)
+            self.block()
+            self.prefixes.pop()
+        elif tag == 'pre':
+            self.block()
+            self.write('```')
+            self.block(1)
+            self.write_lines(get_text(element).strip('\n'))
+            self.block(1)
+            self.write('```')
+            self.block()
+        elif tag == 'table':
+            self.render_table(element)
+        elif tag == 'hr':
+            self.block()
+            self.write('---')
+            self.block()
+        elif tag == 'br':
+            self.block(1)
+        elif tag == 'a':
+            label = self.render_inline(element)
+            href = element.get('href', '')
+            if label and href and not href.startswith(('#', 'javascript:')):
+                self.write(f"[{label}]({href})")
+            elif label:
+                self.write(label)
+        elif tag == 'img':
+            src = element.get('src', '')
+            if src and not src.startswith('data:'):
+                self.write(f"![{element.get('alt', '').strip()}]({src})")
+        elif tag == 'code':
+            text = get_text(element).strip()
+            if text:
+                self.write(f"`{text}`")
+        elif tag in EMPHASIS_MARKERS:
+            text = self.render_inline(element)
+            if text:
+                marker = EMPHASIS_MARKERS[tag]
+                self.write(f"{marker}{text}{marker}")
+        else:
+            self.render_children(element)
+
+    def render_list(self, element: HtmlElement) -> None:
+        """Rend une liste ordonnée ou non, les listes imbriquées étant indentées sous leur élément."""
+        self.block(1 if self.list_depth else 2)
+        self.list_depth += 1
+        start = element.get('start', '1')
+        number = int(start) if start.isdigit() else 1
+
+        self.write_text(element.text)
+        for child in element:
+            if is_element(child) and child.tag == 'li':
+                marker = f"{number}. " if element.tag == 'ol' else '* '
+                number += 1
+                self.block(1)
+                self.write(marker)
+                self.after_marker = True
+                self.prefixes.append(' ' * len(marker))
+                self.render_children(child)
+                self.prefixes.pop()
+                self.after_marker = False
+                self.block(1)
+            elif is_element(child):
+                self.render_element(child)
+            self.write_text(child.tail)
+
+        self.list_depth -= 1
+        self.block(1 if self.list_depth else 2)
+
+    def render_table(self, table: HtmlElement) -> None:
+        """Rend un tableau, sa première ligne servant d'en-tête."""
+        rows = []
+        for row in self.iter_rows(table):
+            cells = [self.render_inline(cell).replace('|', '\\|') for cell in row
+                     if is_element(cell) and cell.tag in ('td', 'th')]
+            if cells:
+                rows.append(cells)
+        if not rows:
+            return
+
+        width = max(len(cells) for cells in rows)
+        self.block()
+        for index, cells in enumerate(rows):
+            cells += [''] * (width - len(cells))
+            self.write(f"| {' | '.join(cells)} |")
+            self.block(1)
+            if index == 0:
+                self.write(f"|{' --- |' * width}")
+                self.block(1)
+        self.block()
+
+    def iter_rows(self, table: HtmlElement):
+        """Itère sur les lignes d'un tableau, sans celles des tableaux imbriqués."""
+        for child in table:
+            if not is_element(child):
+                continue
+            if child.tag == 'tr':
+                yield child
+            elif child.tag in TABLE_SECTION_TAGS:
+                yield from (row for row in child if is_element(row) and row.tag == 'tr')
+
+
+def render_markdown(element: HtmlElement, include_title: bool = True) -> str:
+    """
+    Fonction utilitaire pour rendre un arbre lxml en Markdown.
+
+    Args:
+        element: Le document ou l'élément à rendre
+        include_title: Si True, commence par le titre du document (<title>) s'il existe
+
+    Returns:
+        Le contenu au format Markdown
+    """
+    return MarkdownRenderer().render(element, include_title)
@@ -4,13 +4,20 @@ Module principal de l'application Web Scraper et Convertisseur Markdown.
 import os
 import logging
 import time
-from typing import Dict, Optional, Union, List
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Union, List, Iterator, Any
 from urllib.parse import urlparse
 import pathlib
 from dotenv import load_dotenv
 
 from src.web2llm.app.scraper.scraper import WebScraper
+from src.web2llm.app.scraper.async_scraper import AsyncWebScraper
 from src.web2llm.app.converter.converter import MarkdownConverter
+from src.web2llm.app.utils.html import parse_html, get_text
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, 
@@ -24,6 +31,134 @@ load_dotenv()
 OUTPUT_DIR = os.getenv('OUTPUT_DIR', './output')
 DEFAULT_FILENAME = os.getenv('DEFAULT_FILENAME', 'scraped_content')
 
+CPU_WORKERS = int(os.getenv('CPU_WORKERS', os.cpu_count() or 1))  # Processus de nettoyage/conversion (0: dans un thread)
+
+# Pool de processus partagé, créé à la première utilisation
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+# Instances propres à chaque processus de calcul
+_worker_scraper: Optional[WebScraper] = None
+_worker_converter: Optional[MarkdownConverter] = None
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Retourne le pool de processus partagé pour le nettoyage et la conversion des pages.
+    Les processus sont démarrés par "spawn" et non par fork: le serveur a des threads (boucle
+    d'événements, verrous du logging et du cache HTTP) dont les verrous seraient copiés dans
+    l'état où ils se trouvent et pourraient bloquer les processus du pool.
+    
+    Returns:
+        Le pool, ou None si CPU_WORKERS vaut 0
+    """
+    global _process_pool
+    if CPU_WORKERS <= 0:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=CPU_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+
+def shutdown_process_pool(pool: Optional[ProcessPoolExecutor] = None, wait: bool = False) -> None:
+    """
+    Arrête le pool de processus partagé; le prochain appel à get_process_pool en crée un nouveau.
+    
+    Args:
+        pool: Le pool à arrêter (par défaut le pool courant); rien n'est fait s'il a déjà été remplacé
+        wait: Si True, attend la fin des conversions en cours
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None or (pool is not None and pool is not _process_pool):
+            return
+        pool, _process_pool = _process_pool, None
+    pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+async def wait_to_completion(future: asyncio.Future) -> Any:
+    """
+    Attend un travail exécuté dans un pool de processus ou de threads, qui ne peut pas être interrompu.
+    Si l'attente est annulée (délai dépassé), l'annulation n'est transmise qu'une fois le travail
+    terminé: les limites de concurrence de l'appelant couvrent ainsi toute sa durée.
+    
+    Args:
+        future: Le résultat attendu du travail (loop.run_in_executor)
+        
+    Returns:
+        Le résultat du travail
+    """
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait({future})
+        raise
+
+
+def convert_page(url: str, html_content: Optional[str], scraper: Optional[WebScraper] = None,
+                 converter: Optional[MarkdownConverter] = None) -> Dict[str, Optional[str]]:
+    """
+    Nettoie une page et la convertit en Markdown.
+    Travail purement CPU exécuté dans un processus du pool: les arguments et le résultat
+    ne contiennent que des chaînes pour être transmis entre processus.
+    
+    Args:
+        url: L'URL de la page (base des liens relatifs)
+        html_content: Le contenu HTML, ou None si la récupération a échoué
+        scraper: Le scraper à utiliser (par défaut celui du processus)
+        converter: Le convertisseur à utiliser (par défaut celui du processus)
+        
+    Returns:
+        Dictionnaire contenant le titre, le HTML nettoyé, le Markdown et l'erreur éventuelle
+    """
+    global _worker_scraper, _worker_converter
+    if scraper is None:
+        if _worker_scraper is None:
+            _worker_scraper = WebScraper()
+        scraper = _worker_scraper
+    if converter is None:
+        if _worker_converter is None:
+            _worker_converter = MarkdownConverter()
+        converter = _worker_converter
+    
+    page = {"title": None, "clean_html": None, "markdown": None, "error": None}
+    try:
+        scraped_data = scraper.scrape_html(url, html_content, clean=True, extract_text=True)
+        
+        # Stocker le titre
+        page["title"] = scraped_data["title"]
+        
+        if not scraped_data["clean_html"]:
+            return page
+        
+        # Conversion en Markdown
+        logger.info("Conversion du HTML en Markdown")
+        markdown_content = converter.html_to_markdown(
+            scraped_data["clean_tree"] if scraped_data["clean_tree"] is not None else scraped_data["clean_html"], url)
+        
+        # Vérifier si la conversion a produit un résultat significatif
+        if not markdown_content or len(markdown_content) < 100:
+            logger.warning("Conversion en Markdown insuffisante, tentative avec le texte brut")
+            
+            # Si le texte brut est disponible, l'utiliser comme alternative
+            if scraped_data["text_content"]:
+                markdown_content = scraped_data["text_content"]
+            else:
+                # Dernière tentative: extraire le texte à partir du HTML nettoyé
+                clean_tree = scraped_data["clean_tree"]
+                if clean_tree is None:
+                    clean_tree = parse_html(scraped_data["clean_html"])
+                markdown_content = get_text(clean_tree, separator='\n\n', strip=True)
+        
+        page["clean_html"] = scraped_data["clean_html"]
+        page["markdown"] = markdown_content
+    except Exception as e:
+        page["error"] = str(e)
+    return page
+
+
 class WebToMarkdown:
     """Classe principale combinant le scraping et la conversion en Markdown."""
     
@@ -108,53 +243,104 @@ class WebToMarkdown:
             save: Si True, sauvegarde le résultat dans un fichier
             filename: Nom du fichier pour la sauvegarde
             
+        Returns:
+            Dictionnaire avec les résultats et le statut
+        """
+        logger.info(f"Scraping de l'URL: {url}")
+        html_content = self.scraper.fetch_url(url)
+        return self.process_html(url, html_content, save, filename)
+    
+    async def aprocess_url(self, url: str, scraper: AsyncWebScraper, save: bool = False,
+                           filename: Optional[str] = None) -> Dict[str, Union[str, None, bool]]:
+        """
+        Version asynchrone de process_url: la page est récupérée avec le scraper asynchrone,
+        puis nettoyée et convertie dans un processus du pool de calcul, pour que plusieurs pages
+        utilisent plusieurs cœurs sans bloquer la boucle d'événements. Une annulation pendant la
+        conversion ne prend effet qu'à la fin de celle-ci (wait_to_completion).
+        
+        Args:
+            url: L'URL à traiter
+            scraper: Le scraper asynchrone dont le pool de connexions est utilisé
+            save: Si True, sauvegarde le résultat dans un fichier
+            filename: Nom du fichier pour la sauvegarde
+            
+        Returns:
+            Dictionnaire avec les résultats et le statut
+        """
+        logger.info(f"Scraping de l'URL: {url}")
+        html_content = await scraper.fetch_url(url)
+        
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        if pool is not None:
+            try:
+                page = await wait_to_completion(loop.run_in_executor(pool, convert_page, url, html_content))
+            except BrokenProcessPool:
+                # Un processus du pool s'est arrêté brutalement: le pool n'accepte plus de travail,
+                # il est remplacé au prochain appel et cette page est convertie dans un thread
+                logger.warning(f"Pool de processus interrompu, conversion de {url} dans le processus courant")
+                shutdown_process_pool(pool)
+                pool = None
+        if pool is None:
+            page = await wait_to_completion(
+                loop.run_in_executor(None, convert_page, url, html_content, self.scraper, self.converter))
+        
+        # Les sauvegardes sur disque sont faites dans un thread
+        return await asyncio.to_thread(self.build_result, url, html_content, page, save, filename)
+    
+    def process_html(self, url: str, html_content: Optional[str], save: bool = False,
+                     filename: Optional[str] = None) -> Dict[str, Union[str, None, bool]]:
+        """
+        Nettoie et convertit en Markdown le contenu HTML d'une page déjà récupérée, dans le processus courant.
+        
+        Args:
+            url: L'URL de la page
+            html_content: Le contenu HTML, ou None si la récupération a échoué
+            save: Si True, sauvegarde le résultat dans un fichier
+            filename: Nom du fichier pour la sauvegarde
+            
+        Returns:
+            Dictionnaire avec les résultats et le statut
+        """
+        page = convert_page(url, html_content, self.scraper, self.converter)
+        return self.build_result(url, html_content, page, save, filename)
+    
+    def build_result(self, url: str, html_content: Optional[str], page: Dict[str, Optional[str]],
+                     save: bool = False, filename: Optional[str] = None) -> Dict[str, Union[str, None, bool]]:
+        """
+        Construit le résultat du traitement d'une page convertie et le sauvegarde si demandé.
+        
+        Args:
+            url: L'URL de la page
+            html_content: Le contenu HTML brut, sauvegardé en secours en cas d'erreur
+            page: La page convertie par convert_page
+            save: Si True, sauvegarde le résultat dans un fichier
+            filename: Nom du fichier pour la sauvegarde
+            
         Returns:
             Dictionnaire avec les résultats et le statut
         """
         result = {
             "url": url,
-            "title": None,
+            "title": page["title"],
             "markdown": None,
             "saved": False,
             "saved_path": None,
             "success": False,
-            "error": None,
+            "error": page["error"],
             "html_saved": False,
             "html_saved_path": None
         }
         
         try:
-            # Définir l'URL de base pour la conversion des liens relatifs
-            self.converter.base_url = url
+            if page["error"]:
+                raise RuntimeError(page["error"])
             
-            # Scraper l'URL
-            logger.info(f"Scraping de l'URL: {url}")
-            scraped_data = self.scraper.scrape(url, clean=True, extract_text=True)
-            
-            # Stocker le titre
-            result["title"] = scraped_data["title"]
-            
-            if not scraped_data["clean_html"]:
+            if page["markdown"] is None:
                 result["error"] = "Impossible de récupérer ou nettoyer le contenu HTML"
                 return result
             
-            # Conversion en Markdown
-            logger.info("Conversion du HTML en Markdown")
-            markdown_content = self.converter.html_to_markdown(
-                scraped_data["clean_html"], url)
-            
-            # Vérifier si la conversion a produit un résultat significatif
-            if not markdown_content or len(markdown_content) < 100:
-                logger.warning("Conversion en Markdown insuffisante, tentative avec le texte brut")
-                
-                # Si le texte brut est disponible, l'utiliser comme alternative
-                if scraped_data["text_content"]:
-                    markdown_content = scraped_data["text_content"]
-                else:
-                    # Dernière tentative: extraire le texte à partir du HTML nettoyé
-                    from bs4 import BeautifulSoup
-                    soup = BeautifulSoup(scraped_data["clean_html"], 'html.parser')
-                    markdown_content = soup.get_text(separator='\n\n', strip=True)
+            markdown_content = page["markdown"]
             
             # Mise à jour du résultat
             result["markdown"] = markdown_content
@@ -180,7 +366,7 @@ class WebToMarkdown:
                 if len(markdown_content) < 500 or "<" in markdown_content:
                     html_filename = filename.replace('.md', '.html')
                     html_filepath = os.path.join(self.output_dir, html_filename)
-                    html_saved = self.save_raw_html(scraped_data["clean_html"], html_filepath)
+                    html_saved = self.save_raw_html(page["clean_html"], html_filepath)
                     result["html_saved"] = html_saved
                     result["html_saved_path"] = html_filepath if html_saved else None
                     
@@ -194,14 +380,14 @@ class WebToMarkdown:
             result["error"] = str(e)
             
             # En cas d'erreur, tenter de sauvegarder le HTML brut si disponible
-            if save and scraped_data and "raw_html" in scraped_data and scraped_data["raw_html"]:
+            if save and html_content:
                 if not filename:
                     filename = self.generate_filename(url, result["title"], '.html')
                 else:
                     filename = filename.replace('.md', '.html')
                 
                 html_filepath = os.path.join(self.output_dir, filename)
-                html_saved = self.save_raw_html(scraped_data["raw_html"], html_filepath)
+                html_saved = self.save_raw_html(html_content, html_filepath)
                 
                 result["html_saved"] = html_saved
                 result["html_saved_path"] = html_filepath if html_saved else None
@@ -211,9 +397,73 @@ class WebToMarkdown:
             
             return result
     
+    def stream_html(self, url: str, html_content: Optional[str], save: bool = False,
+                    filename: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Nettoie une page déjà récupérée et prépare sa conversion en Markdown section par section.
+        La conversion n'a lieu qu'au fur et à mesure de la lecture des sections, et rien n'est
+        écrit sur disque sauf si la sauvegarde est demandée.
+        
+        Args:
+            url: L'URL de la page
+            html_content: Le contenu HTML, ou None si la récupération a échoué
+            save: Si True, écrit aussi les sections dans un fichier au fur et à mesure
+            filename: Nom du fichier (pour la sauvegarde et le téléchargement)
+            
+        Returns:
+            Dictionnaire contenant le titre, le nom de fichier et l'itérateur des sections Markdown
+            
+        Raises:
+            ValueError: Si le contenu HTML n'a pas pu être récupéré ou nettoyé
+        """
+        scraped_data = self.scraper.scrape_html(url, html_content, clean=True)
+        if not scraped_data["clean_html"]:
+            raise ValueError("Impossible de récupérer ou nettoyer le contenu HTML")
+        
+        # Générer un nom de fichier si non spécifié
+        if not filename:
+            filename = self.generate_filename(url, scraped_data["title"])
+        # S'assurer que l'extension est .md
+        elif not filename.endswith('.md'):
+            filename += '.md'
+        
+        sections = self.converter.iter_markdown(
+            scraped_data["clean_tree"] if scraped_data["clean_tree"] is not None else scraped_data["clean_html"], url)
+        if save:
+            sections = self.iter_and_save(sections, os.path.join(self.output_dir, filename))
+        
+        return {
+            "url": url,
+            "title": scraped_data["title"],
+            "filename": filename,
+            "sections": sections,
+        }
+    
+    def iter_and_save(self, sections: Iterator[str], filepath: str) -> Iterator[str]:
+        """
+        Transmet des sections Markdown tout en les écrivant dans un fichier.
+        Le fichier n'apparaît sous son nom définitif qu'une fois toutes les sections écrites.
+        
+        Args:
+            sections: Les sections Markdown
+            filepath: Chemin où sauvegarder le fichier
+            
+        Returns:
+            Un itérateur sur les mêmes sections
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        temp_filepath = f"{filepath}.part"
+        with open(temp_filepath, 'w', encoding='utf-8') as f:
+            for section in sections:
+                f.write(section)
+                yield section
+        os.replace(temp_filepath, filepath)
+        logger.info(f"Contenu Markdown sauvegardé avec succès dans {filepath}")
+    
     def process_multiple_urls(self, urls: List[str], save: bool = True) -> Dict[str, List[Dict]]:
         """
         Traite plusieurs URLs en parallèle.
+        Ne doit pas être appelée depuis une boucle d'événements: utiliser aprocess_multiple_urls.
         
         Args:
             urls: Liste d'URLs à traiter
@@ -222,11 +472,28 @@ class WebToMarkdown:
         Returns:
             Dictionnaire contenant les résultats pour chaque URL
         """
-        results = []
+        return asyncio.run(self.aprocess_multiple_urls(urls, save=save))
+    
+    async def aprocess_multiple_urls(self, urls: List[str], save: bool = True,
+                                     scraper: Optional[AsyncWebScraper] = None) -> Dict[str, List[Dict]]:
+        """
+        Traite plusieurs URLs en parallèle avec le scraper asynchrone.
+        Les pages sont récupérées simultanément à travers un pool de connexions partagé
+        (limité par site et espacé par un délai de politesse).
+        
+        Args:
+            urls: Liste d'URLs à traiter
+            save: Si True, sauvegarde les résultats
+            scraper: Scraper asynchrone déjà ouvert à utiliser (par défaut, un scraper dédié à ce lot)
+            
+        Returns:
+            Dictionnaire contenant les résultats pour chaque URL, dans l'ordre des URLs
+        """
+        if scraper is None:
+            async with AsyncWebScraper() as scraper:
+                return await self.aprocess_multiple_urls(urls, save, scraper)
         
-        for url in urls:
-            result = self.process_url(url, save=save)
-            results.append(result)
+        results = await asyncio.gather(*(self.aprocess_url(url, scraper, save=save) for url in urls))
         
         return {
             "total": len(urls),
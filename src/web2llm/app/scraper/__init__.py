@@ -3,5 +3,6 @@ Module de scraping.
 """
 
 from src.web2llm.app.scraper.scraper import WebScraper, scrape_url
+from src.web2llm.app.scraper.async_scraper import AsyncWebScraper
 
-__all__ = ['WebScraper', 'scrape_url'] 
\ No newline at end of file
+__all__ = ['WebScraper', 'AsyncWebScraper', 'scrape_url'] 
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+Backend asynchrone du scraper, pour récupérer de nombreuses URLs en parallèle.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+from dotenv import load_dotenv
+
+from src.web2llm.app.scraper.http_cache import HttpCache, http_cache
+from src.web2llm.app.scraper.scraper import (
+    DEFAULT_USER_AGENT, DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES, DEFAULT_MAX_CONTENT_LENGTH,
+    DOWNLOAD_CHUNK_SIZE, ContentRejectedError,
+    check_response_headers, append_chunk, decode_body
+)
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO, 
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Chargement des variables d'environnement
+load_dotenv()
+
+# Configuration par défaut
+DEFAULT_MAX_CONNECTIONS = int(os.getenv('SCRAPER_MAX_CONNECTIONS', 20))                 # Connexions simultanées au total
+DEFAULT_MAX_CONNECTIONS_PER_HOST = int(os.getenv('SCRAPER_MAX_CONNECTIONS_PER_HOST', 4))  # Connexions simultanées par site
+DEFAULT_POLITENESS_DELAY = float(os.getenv('SCRAPER_POLITENESS_DELAY', 0.2))           # Délai minimal entre deux requêtes vers un même site (secondes)
+DNS_CACHE_TTL = 300                                                                     # Durée de conservation des résolutions DNS (secondes)
+KEEPALIVE_TIMEOUT = 30                                                                  # Durée de conservation d'une connexion inactive (secondes)
+
+
+class AsyncWebScraper:
+    """
+    Récupère des pages web de manière asynchrone avec aiohttp.
+    Toutes les requêtes partagent un même pool de connexions keep-alive et un cache DNS,
+    le nombre de connexions par site est limité et les requêtes vers un même site sont espacées.
+
+    S'utilise comme gestionnaire de contexte asynchrone:
+
+        async with AsyncWebScraper() as scraper:
+            html = await scraper.fetch_url(url)
+    """
+
+    def __init__(self, user_agent: str = DEFAULT_USER_AGENT,
+                 timeout: int = DEFAULT_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 max_content_length: int = DEFAULT_MAX_CONTENT_LENGTH,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+                 politeness_delay: float = DEFAULT_POLITENESS_DELAY,
+                 cache: Optional[HttpCache] = http_cache):
+        """
+        Initialise le scraper asynchrone.
+
+        Args:
+            user_agent: User-Agent à utiliser pour les requêtes HTTP
+            timeout: Délai d'attente en secondes pour les requêtes
+            max_retries: Nombre maximal de tentatives en cas d'échec
+            max_content_length: Taille maximale d'une page téléchargée, en octets
+            max_connections: Nombre maximal de connexions simultanées
+            max_connections_per_host: Nombre maximal de connexions simultanées vers un même site
+            politeness_delay: Délai minimal entre deux requêtes vers un même site, en secondes
+            cache: Cache HTTP sur disque (None pour toujours interroger le réseau)
+        """
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_content_length = max_content_length
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.politeness_delay = politeness_delay
+        self.cache = cache
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._next_request: Dict[str, float] = {}
+
+    async def __aenter__(self) -> "AsyncWebScraper":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        """Ouvre le pool de connexions (dans la boucle d'événements courante)."""
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_connections_per_host,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": self.user_agent},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def close(self) -> None:
+        """Ferme les connexions du pool."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def wait_for_host(self, url: str) -> None:
+        """
+        Attend que la prochaine requête vers le site de l'URL soit autorisée par le délai de politesse.
+
+        Args:
+            url: L'URL qui va être demandée
+        """
+        if self.politeness_delay <= 0:
+            return
+
+        host = urlparse(url).netloc.lower()
+        now = time.monotonic()
+        # Réserver le créneau avant d'attendre, pour que les requêtes concurrentes s'échelonnent
+        slot = max(now, self._next_request.get(host, 0.0))
+        self._next_request[host] = slot + self.politeness_delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def fetch_url(self, url: str) -> Optional[str]:
+        """
+        Récupère le contenu HTML d'une URL.
+        Comme WebScraper.fetch_url, le corps est téléchargé par blocs et abandonné dès que son type
+        ou sa taille ne sont pas acceptés, et le cache HTTP est consulté avant le réseau.
+
+        Args:
+            url: L'URL à scraper
+
+        Returns:
+            Le contenu HTML ou None en cas d'échec
+        """
+        if self.session is None:
+            raise RuntimeError("AsyncWebScraper doit être ouvert avec 'async with' ou open()")
+
+        # Les accès à la base SQLite du cache sont faits dans un thread
+        cached = await asyncio.to_thread(self.cache.lookup, url) if self.cache else None
+        if cached and cached.is_fresh():
+            logger.info(f"Page servie depuis le cache HTTP: {url}")
+            return decode_body(cached.content_type, cached.body)
+
+        for attempt in range(self.max_retries):
+            try:
+                await self.wait_for_host(url)
+                logger.info(f"Tentative {attempt + 1}/{self.max_retries} de récupération de {url}")
+                headers = cached.conditional_headers() if cached else {}
+                async with self.session.get(url, headers=headers) as response:
+                    if cached and response.status == 304:
+                        # Page inchangée: seule sa fraîcheur est mise à jour
+                        logger.info(f"Page inchangée, servie depuis le cache HTTP: {url}")
+                        await asyncio.to_thread(self.cache.refresh, url, response.headers)
+                        return decode_body(cached.content_type, cached.body)
+
+                    response.raise_for_status()
+                    check_response_headers(url, response.headers, self.max_content_length)
+
+                    body = bytearray()
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        append_chunk(url, body, chunk, self.max_content_length)
+
+                if self.cache:
+                    await asyncio.to_thread(self.cache.store, url, bytes(body), response.headers)
+
+                # Détection de l'encodage sur les en-têtes et les premiers octets uniquement
+                return decode_body(response.headers.get('Content-Type', ''), bytes(body))
+            except ContentRejectedError as e:
+                # Inutile de réessayer: la réponse serait la même
+                logger.warning(str(e))
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Erreur lors de la récupération de {url}: {str(e) or type(e).__name__}")
+                if attempt == self.max_retries - 1:
+                    logger.error(f"Échec après {self.max_retries} tentatives.")
+                    return None
+        return None
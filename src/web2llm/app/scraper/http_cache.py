@@ -0,0 +1,296 @@
+"""
+Cache HTTP sur disque pour le scraper.
+
+Les pages récupérées sont conservées dans une base SQLite avec leurs validateurs (ETag, Last-Modified).
+Une page encore fraîche selon Cache-Control/Expires est servie sans accès réseau; une page expirée
+est revalidée par une requête conditionnelle (If-None-Match / If-Modified-Since), et seule une
+réponse 304 est alors nécessaire. Les pages les moins récemment utilisées sont supprimées au-delà
+de la taille maximale du cache.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import logging
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+# Configuration du logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Chargement des variables d'environnement
+load_dotenv()
+
+# Configuration
+HTTP_CACHE_PATH = os.getenv('HTTP_CACHE_PATH', './http_cache.sqlite')
+HTTP_CACHE_MAX_SIZE = int(os.getenv('HTTP_CACHE_MAX_SIZE', 500 * 1024 * 1024))   # Taille maximale des pages en cache (octets, 0 pour désactiver)
+HTTP_CACHE_DEFAULT_TTL = int(os.getenv('HTTP_CACHE_DEFAULT_TTL', 24 * 3600))     # Fraîcheur d'une page sans indication du serveur (secondes)
+HEURISTIC_FRESHNESS_RATIO = 0.1                                                  # Fraction de l'âge indiqué par Last-Modified (RFC 9111)
+
+CACHE_CONTROL_PATTERN = re.compile(r'([\w-]+)\s*(?:=\s*"?([^",]*)"?)?')
+# En-têtes de fraîcheur conservés avec la page: une réponse 304 qui les omet ne les annule pas (RFC 9111, 4.3.4)
+FRESHNESS_HEADERS = ('Cache-Control', 'Expires', 'Last-Modified', 'ETag')
+
+
+@dataclass
+class CachedResponse:
+    """Page conservée dans le cache."""
+    url: str
+    body: bytes
+    content_type: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires: float
+
+    def is_fresh(self) -> bool:
+        """Indique si la page peut être servie sans revalidation."""
+        return time.time() < self.expires
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """En-têtes de la requête conditionnelle qui revalide la page."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Analyse un en-tête Cache-Control.
+
+    Args:
+        value: La valeur de l'en-tête
+
+    Returns:
+        Dictionnaire des directives (en minuscules) et de leurs valeurs éventuelles
+    """
+    return {name.lower(): argument for name, argument in CACHE_CONTROL_PATTERN.findall(value or '')}
+
+
+def parse_http_date(value: Optional[str]) -> Optional[float]:
+    """
+    Convertit une date HTTP en timestamp.
+
+    Args:
+        value: La date HTTP
+
+    Returns:
+        Le timestamp, ou None si la date est absente ou invalide
+    """
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers, default_ttl: int = HTTP_CACHE_DEFAULT_TTL) -> Optional[float]:
+    """
+    Calcule la durée pendant laquelle une réponse peut être servie sans revalidation.
+
+    Args:
+        headers: Les en-têtes de la réponse
+        default_ttl: Durée utilisée quand le serveur ne donne aucune indication
+
+    Returns:
+        La durée en secondes (0 pour revalider à chaque utilisation), ou None si la réponse ne doit pas être conservée
+    """
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+
+    for directive in ('s-maxage', 'max-age'):
+        argument = directives.get(directive)
+        if argument is not None and argument.isdigit():
+            # L'âge déjà passé dans des caches intermédiaires est déduit
+            age = headers.get('Age', '0')
+            return max(0, int(argument) - (int(age) if age.isdigit() else 0))
+
+    date = parse_http_date(headers.get('Date')) or time.time()
+    if headers.get('Expires') is not None:
+        expires = parse_http_date(headers.get('Expires'))
+        # Une date d'expiration invalide signifie que la réponse est déjà expirée
+        return max(0, expires - date) if expires is not None else 0
+
+    last_modified = parse_http_date(headers.get('Last-Modified'))
+    if last_modified is not None:
+        return min(max(0, date - last_modified) * HEURISTIC_FRESHNESS_RATIO, default_ttl)
+
+    return default_ttl
+
+
+def freshness_headers(headers) -> Dict[str, str]:
+    """
+    Extrait les en-têtes de fraîcheur d'une réponse.
+
+    Args:
+        headers: Les en-têtes de la réponse
+
+    Returns:
+        Dictionnaire des en-têtes de FRESHNESS_HEADERS présents dans la réponse
+    """
+    return {name: headers.get(name) for name in FRESHNESS_HEADERS if headers.get(name) is not None}
+
+
+class HttpCache:
+    """
+    Cache HTTP persistant stocké dans SQLite, partageable entre threads.
+    Les pages sont indexées par URL et supprimées dans l'ordre de dernière utilisation
+    quand la taille totale dépasse la limite.
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_size: int = HTTP_CACHE_MAX_SIZE,
+                 default_ttl: int = HTTP_CACHE_DEFAULT_TTL):
+        """
+        Initialise le cache.
+
+        Args:
+            path: Chemin de la base SQLite
+            max_size: Taille maximale des pages conservées, en octets
+            default_ttl: Fraîcheur d'une page sans indication du serveur, en secondes
+        """
+        self.path = path
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """La connexion SQLite, ouverte à la première utilisation."""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "url TEXT PRIMARY KEY, body BLOB NOT NULL, content_type TEXT NOT NULL, "
+                "etag TEXT, last_modified TEXT, expires REAL NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL, freshness_headers TEXT NOT NULL DEFAULT '{}')"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._connection.commit()
+        return self._connection
+
+    def lookup(self, url: str) -> Optional[CachedResponse]:
+        """
+        Recherche une page dans le cache.
+
+        Args:
+            url: L'URL de la page
+
+        Returns:
+            La page conservée (fraîche ou à revalider), ou None si elle n'est pas en cache
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT body, content_type, etag, last_modified, expires FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE responses SET last_used = ? WHERE url = ?", (time.time(), url))
+            self.connection.commit()
+
+            entry = CachedResponse(url, *row)
+            if entry.is_fresh():
+                self.hits += 1
+        return entry
+
+    def store(self, url: str, body: bytes, headers) -> None:
+        """
+        Conserve une page, sauf si le serveur l'interdit (Cache-Control: no-store).
+
+        Args:
+            url: L'URL de la page
+            body: Le corps de la réponse
+            headers: Les en-têtes de la réponse
+        """
+        lifetime = freshness_lifetime(headers, self.default_ttl)
+        if lifetime is None or len(body) > self.max_size:
+            return
+
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(url, body, content_type, etag, last_modified, expires, size, last_used, freshness_headers) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body, headers.get('Content-Type', ''), headers.get('ETag'),
+                 headers.get('Last-Modified'), now + lifetime, len(body), now,
+                 json.dumps(freshness_headers(headers)))
+            )
+            self._evict()
+            self.connection.commit()
+
+    def refresh(self, url: str, headers) -> None:
+        """
+        Met à jour la fraîcheur et les validateurs d'une page revalidée (réponse 304).
+        Les en-têtes de la réponse 304 remplacent ceux de la page conservée, qui restent valables
+        pour ceux que la réponse 304 omet.
+
+        Args:
+            url: L'URL de la page
+            headers: Les en-têtes de la réponse 304
+        """
+        now = time.time()
+        with self._lock:
+            self.revalidations += 1
+            row = self.connection.execute(
+                "SELECT freshness_headers FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            merged = json.loads(row[0]) if row else {}
+            merged.update(freshness_headers(headers))
+            for name in ('Date', 'Age'):
+                if headers.get(name) is not None:
+                    merged[name] = headers.get(name)
+            lifetime = freshness_lifetime(merged, self.default_ttl)
+            if lifetime is None:
+                self.connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+            else:
+                self.connection.execute(
+                    "UPDATE responses SET expires = ?, last_used = ?, freshness_headers = ?, "
+                    "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                    (now + lifetime, now, json.dumps(merged), headers.get('ETag'), headers.get('Last-Modified'), url)
+                )
+            self.connection.commit()
+
+    def _evict(self) -> None:
+        """Supprime les pages les moins récemment utilisées au-delà de la taille maximale (verrou déjà pris)."""
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_size:
+            return
+        excess = total - self.max_size
+        evicted = []
+        for url, size in self.connection.execute("SELECT url, size FROM responses ORDER BY last_used"):
+            evicted.append((url,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.connection.executemany("DELETE FROM responses WHERE url = ?", evicted)
+        logger.info(f"Cache HTTP: {len(evicted)} pages supprimées pour respecter la taille maximale")
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs d'utilisation du cache."""
+        return {
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "misses": self.misses,
+        }
+
+
+# Cache partagé par les scrapers (None si désactivé)
+http_cache = HttpCache() if HTTP_CACHE_MAX_SIZE > 0 else None
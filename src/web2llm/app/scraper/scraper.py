@@ -3,13 +3,20 @@ Module de scraping pour extraire le contenu des pages web.
 """
 import os
 import logging
-from typing import Dict, Optional, Union, List
+from typing import Dict, Optional, Union, List, Tuple
+import copy
+import codecs
 import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml.html import HtmlElement
+from lxml.html.builder import E
 from readability import Document
 from dotenv import load_dotenv
 import re
 
+from src.web2llm.app.scraper.http_cache import HttpCache, http_cache
+from src.web2llm.app.utils.html import parse_html, to_html, get_text, drop, is_element, selector_to_xpath
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -25,13 +32,202 @@ DEFAULT_USER_AGENT = os.getenv(
 )
 DEFAULT_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 30))
 DEFAULT_MAX_RETRIES = int(os.getenv('MAX_RETRIES', 3))
+DEFAULT_MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 5 * 1024 * 1024))  # Taille maximale d'une page (octets)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024                                                      # Taille des blocs téléchargés
+ENCODING_SNIFF_SIZE = 4096                                                           # Octets examinés pour trouver le <meta charset>
+
+# Types de contenu acceptés (les autres réponses sont abandonnées avant le téléchargement du corps)
+ALLOWED_CONTENT_TYPES = {
+    'text/html', 'application/xhtml+xml', 'text/plain',
+    'text/xml', 'application/xml',
+}
+
+CHARSET_HEADER_PATTERN = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+CHARSET_META_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Éléments examinés par la détection de navigation et termes indiquant une liste de liens
+# (liste restreinte de termes pour être moins agressif)
+NAV_CONTAINER_TAGS = {'div', 'section', 'ul', 'ol'}
+NAV_LIST_TERMS = ['menu', 'navigation', 'liens', 'links']
+
+# Éléments portant des attributs de style, de classe ou des gestionnaires d'événements JavaScript
+ELEMENTS_WITH_REMOVABLE_ATTRIBUTES = etree.XPath(
+    "descendant-or-self::*[@style or @class or @*[starts-with(name(), 'on')]]")
+STYLED_ELEMENTS = etree.XPath("descendant-or-self::*[@style]")
+
+# Sections de contenu courantes qui pourraient être manquées par Readability
+CONTENT_SELECTORS = [selector_to_xpath(selector) for selector in [
+    'article', '.article', '.post', '.content', '.main-content',
+    'main', '#main', '#content', '.body', '.entry-content',
+    '.page-content', '[role="main"]', '[itemprop="articleBody"]',
+    '.blog-post', '.text', '.publication-content', '.story'
+]]
+
+# Sélecteurs pour les headers et footers courants - version allégée
+HEADER_SELECTORS = [
+    'header', '#header', '.header', '.site-header', 
+    '.masthead', '[role="banner"]'
+]
+
+FOOTER_SELECTORS = [
+    'footer', '#footer', '.footer', '.site-footer',
+    '.copyright', '[role="contentinfo"]'
+]
+
+# Sélecteurs essentiels pour les navbars
+NAVBAR_SELECTORS = [
+    'nav', '.navbar', '.main-nav', 
+    '#navbar', '#navigation', '#menu',
+    '[role="navigation"]'
+]
+
+# Sélecteurs essentiels pour les sidebars
+SIDEBAR_SELECTORS = [
+    'aside', '.sidebar', '#sidebar',
+    '[role="complementary"]'
+]
+
+# Éléments non désirés les plus courants et intrusifs
+UNWANTED_SELECTORS = [
+    '.ads', '.advertisement', '.banner', '.cookie-notice', 
+    '.popup', '.modal', '.newsletter-signup', 
+    '.cookie-banner', '.adsbygoogle', '.ad-container',
+    '.gdpr'
+]
+
+# Combiner tous les sélecteurs, compilés une seule fois en XPath
+REMOVABLE_SELECTORS = [
+    (selector, selector_to_xpath(selector))
+    for selector in HEADER_SELECTORS + FOOTER_SELECTORS + NAVBAR_SELECTORS + SIDEBAR_SELECTORS + UNWANTED_SELECTORS
+]
+
+class ContentRejectedError(Exception):
+    """Réponse refusée avant ou pendant le téléchargement (type de contenu ou taille non acceptés)."""
+
+
+def check_response_headers(url: str, headers, max_content_length: int) -> None:
+    """
+    Vérifie les en-têtes d'une réponse avant d'en télécharger le corps.
+    
+    Args:
+        url: L'URL demandée
+        headers: Les en-têtes de la réponse
+        max_content_length: Taille maximale acceptée du corps, en octets
+        
+    Raises:
+        ContentRejectedError: Si le type de contenu n'est pas du texte ou du HTML, ou si la taille annoncée est trop grande
+    """
+    content_type = headers.get('Content-Type', '')
+    mime_type = content_type.split(';', 1)[0].strip().lower()
+    # Sans Content-Type, on tente quand même le téléchargement
+    if mime_type and mime_type not in ALLOWED_CONTENT_TYPES:
+        raise ContentRejectedError(f"Type de contenu non pris en charge pour {url}: {mime_type}")
+    
+    content_length = headers.get('Content-Length')
+    if content_length and content_length.isdigit() and int(content_length) > max_content_length:
+        raise ContentRejectedError(
+            f"Contenu trop volumineux pour {url}: {content_length} octets (maximum {max_content_length})")
+
+
+def append_chunk(url: str, body: bytearray, chunk: bytes, max_content_length: int) -> None:
+    """
+    Ajoute un bloc téléchargé au corps de la réponse, en interrompant le téléchargement si la taille maximale est dépassée.
+    
+    Args:
+        url: L'URL demandée
+        body: Le corps déjà téléchargé
+        chunk: Le bloc reçu
+        max_content_length: Taille maximale acceptée du corps, en octets
+        
+    Raises:
+        ContentRejectedError: Si le corps dépasse la taille maximale
+    """
+    body.extend(chunk)
+    if len(body) > max_content_length:
+        raise ContentRejectedError(f"Contenu trop volumineux pour {url}: plus de {max_content_length} octets")
+
+
+def detect_encoding(content_type: str, head: bytes) -> Optional[str]:
+    """
+    Détecte l'encodage d'une page à partir du BOM, de l'en-tête Content-Type ou d'une balise <meta>
+    dans les premiers octets, sans analyser le corps entier.
+    
+    Args:
+        content_type: La valeur de l'en-tête Content-Type
+        head: Les premiers octets du corps
+        
+    Returns:
+        Le nom de l'encodage, ou None s'il n'est pas déclaré
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    
+    candidates = []
+    match = CHARSET_HEADER_PATTERN.search(content_type or '')
+    if match:
+        candidates.append(match.group(1))
+    match = CHARSET_META_PATTERN.search(head[:ENCODING_SNIFF_SIZE])
+    if match:
+        candidates.append(match.group(1).decode('ascii', 'ignore'))
+    
+    # ISO-8859-1 est souvent déclaré à tort: on lui préfère une déclaration plus précise
+    candidates.sort(key=lambda name: name.lower() in ('iso-8859-1', 'latin-1', 'latin1'))
+    for name in candidates:
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            continue
+    return None
+
+
+def decode_content(body: bytes, encoding: Optional[str]) -> str:
+    """
+    Décode le corps d'une page.
+    Sans encodage déclaré (ou s'il s'agit d'ISO-8859-1), l'UTF-8 est essayé avant de se rabattre sur Windows-1252.
+    
+    Args:
+        body: Le corps de la réponse
+        encoding: L'encodage détecté par detect_encoding
+        
+    Returns:
+        Le contenu décodé
+    """
+    if encoding is None or encoding == 'iso8859-1':
+        try:
+            return body.decode('utf-8')
+        except UnicodeDecodeError:
+            return body.decode('cp1252', errors='replace')
+    return body.decode(encoding, errors='replace')
+
+
+def decode_body(content_type: str, body: bytes) -> str:
+    """
+    Décode le corps d'une page avec l'encodage déclaré dans les en-têtes ou les premiers octets.
+    
+    Args:
+        content_type: La valeur de l'en-tête Content-Type
+        body: Le corps de la réponse
+        
+    Returns:
+        Le contenu décodé
+    """
+    return decode_content(body, detect_encoding(content_type, body[:ENCODING_SNIFF_SIZE]))
+
 
 class WebScraper:
     """Classe pour scraper des pages web et nettoyer leur contenu."""
     
     def __init__(self, user_agent: str = DEFAULT_USER_AGENT, 
                  timeout: int = DEFAULT_TIMEOUT,
-                 max_retries: int = DEFAULT_MAX_RETRIES):
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 max_content_length: int = DEFAULT_MAX_CONTENT_LENGTH,
+                 cache: Optional[HttpCache] = http_cache):
         """
         Initialise le scraper.
         
@@ -39,16 +235,25 @@ class WebScraper:
             user_agent: User-Agent à utiliser pour les requêtes HTTP
             timeout: Délai d'attente en secondes pour les requêtes
             max_retries: Nombre maximal de tentatives en cas d'échec
+            max_content_length: Taille maximale d'une page téléchargée, en octets
+            cache: Cache HTTP sur disque (None pour toujours interroger le réseau)
         """
         self.user_agent = user_agent
         self.timeout = timeout
         self.max_retries = max_retries
+        self.max_content_length = max_content_length
+        self.cache = cache
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": self.user_agent})
     
     def fetch_url(self, url: str) -> Optional[str]:
         """
         Récupère le contenu HTML d'une URL.
+        Le corps est téléchargé par blocs: les réponses qui ne sont pas du texte ou du HTML sont
+        abandonnées dès réception des en-têtes, et le téléchargement est interrompu dès que
+        la taille maximale est dépassée.
+        Une page encore fraîche dans le cache HTTP est servie sans accès réseau, une page expirée
+        est revalidée par une requête conditionnelle.
         
         Args:
             url: L'URL à scraper
@@ -56,22 +261,38 @@ class WebScraper:
         Returns:
             Le contenu HTML ou None en cas d'échec
         """
+        cached = self.cache.lookup(url) if self.cache else None
+        if cached and cached.is_fresh():
+            logger.info(f"Page servie depuis le cache HTTP: {url}")
+            return decode_body(cached.content_type, cached.body)
+        
         for attempt in range(self.max_retries):
             try:
                 logger.info(f"Tentative {attempt + 1}/{self.max_retries} de récupération de {url}")
-                response = self.session.get(url, timeout=self.timeout)
-                response.raise_for_status()
-                
-                # Détection de l'encodage
-                encoding = response.encoding
+                headers = cached.conditional_headers() if cached else {}
+                with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                    if cached and response.status_code == 304:
+                        # Page inchangée: seule sa fraîcheur est mise à jour
+                        logger.info(f"Page inchangée, servie depuis le cache HTTP: {url}")
+                        self.cache.refresh(url, response.headers)
+                        return decode_body(cached.content_type, cached.body)
+                    
+                    response.raise_for_status()
+                    check_response_headers(url, response.headers, self.max_content_length)
+                    
+                    body = bytearray()
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        append_chunk(url, body, chunk, self.max_content_length)
                 
-                # Si le site ne spécifie pas d'encodage ou qu'il est incorrect, essayer de le détecter
-                if encoding == 'ISO-8859-1' or not encoding:
-                    detected_encoding = response.apparent_encoding
-                    if detected_encoding:
-                        response.encoding = detected_encoding
+                if self.cache:
+                    self.cache.store(url, bytes(body), response.headers)
                 
-                return response.text
+                # Détection de l'encodage sur les en-têtes et les premiers octets uniquement
+                return decode_body(response.headers.get('Content-Type', ''), bytes(body))
+            except ContentRejectedError as e:
+                # Inutile de réessayer: la réponse serait la même
+                logger.warning(str(e))
+                return None
             except requests.RequestException as e:
                 logger.error(f"Erreur lors de la récupération de {url}: {str(e)}")
                 if attempt == self.max_retries - 1:
@@ -79,128 +300,69 @@ class WebScraper:
                     return None
         return None
     
-    def extract_additional_content(self, soup: BeautifulSoup) -> str:
+    def extract_additional_content(self, doc: HtmlElement) -> List[HtmlElement]:
         """
         Extrait du contenu supplémentaire qui pourrait être ignoré par Readability.
         
         Args:
-            soup: Objet BeautifulSoup contenant la page HTML
+            doc: Arbre lxml contenant la page HTML
             
         Returns:
-            Contenu HTML supplémentaire
+            Copies des éléments de contenu supplémentaire
         """
-        additional_html = ""
+        additional_elements = []
         
         # Rechercher des sections de contenu courantes qui pourraient être manquées
-        content_selectors = [
-            'article', '.article', '.post', '.content', '.main-content',
-            'main', '#main', '#content', '.body', '.entry-content',
-            '.page-content', '[role="main"]', '[itemprop="articleBody"]',
-            '.blog-post', '.text', '.publication-content', '.story'
-        ]
-        
-        for selector in content_selectors:
-            elements = soup.select(selector)
-            if elements:
-                for element in elements:
-                    additional_html += str(element)
+        for selector in CONTENT_SELECTORS:
+            for element in selector(doc):
+                additional_elements.append(copy.deepcopy(element))
         
         # Si aucun contenu n'a été trouvé avec les sélecteurs, essayer d'autres méthodes
-        if not additional_html:
+        if not additional_elements:
             # Obtenir tous les paragraphes qui ont un contenu substantiel
-            paragraphs = []
-            for p in soup.find_all('p'):
-                text = p.get_text().strip()
+            for p in doc.iter('p'):
+                text = get_text(p).strip()
                 # Considérer uniquement les paragraphes avec un contenu significatif
                 if len(text) > 50:  # Paragraphes d'au moins 50 caractères
-                    paragraphs.append(str(p))
-            
-            if paragraphs:
-                additional_html = "\n".join(paragraphs)
+                    additional_elements.append(copy.deepcopy(p))
         
-        return additional_html
+        return additional_elements
     
-    def remove_headers_footers(self, soup: BeautifulSoup) -> BeautifulSoup:
+    def remove_headers_footers(self, doc: HtmlElement) -> HtmlElement:
         """
         Supprime les headers, footers, scripts, styles et autres éléments non désirés des pages web,
         avec une approche plus modérée pour préserver davantage de contenu.
         
         Args:
-            soup: L'objet BeautifulSoup contenant le HTML
+            doc: L'arbre lxml contenant le HTML
             
         Returns:
-            L'objet BeautifulSoup nettoyé
+            L'arbre lxml nettoyé
         """
-        # Liste des sélecteurs pour les headers et footers courants - version allégée
-        header_selectors = [
-            'header', '#header', '.header', '.site-header', 
-            '.masthead', '[role="banner"]'
-        ]
-        
-        footer_selectors = [
-            'footer', '#footer', '.footer', '.site-footer',
-            '.copyright', '[role="contentinfo"]'
-        ]
-        
-        # Sélecteurs essentiels pour les navbars
-        navbar_selectors = [
-            'nav', '.navbar', '.main-nav', 
-            '#navbar', '#navigation', '#menu',
-            '[role="navigation"]'
-        ]
-        
-        # Sélecteurs essentiels pour les sidebars
-        sidebar_selectors = [
-            'aside', '.sidebar', '#sidebar',
-            '[role="complementary"]'
-        ]
-        
-        # Éléments non désirés les plus courants et intrusifs
-        unwanted_selectors = [
-            '.ads', '.advertisement', '.banner', '.cookie-notice', 
-            '.popup', '.modal', '.newsletter-signup', 
-            '.cookie-banner', '.adsbygoogle', '.ad-container',
-            '.gdpr'
-        ]
-        
-        # Combiner tous les sélecteurs
-        all_selectors = header_selectors + footer_selectors + navbar_selectors + sidebar_selectors + unwanted_selectors
-        
-        # Supprimer tous ces éléments
-        for selector in all_selectors:
-            for element in soup.select(selector):
+        # Supprimer tous les éléments des sélecteurs de headers, footers, navbars, sidebars et publicités
+        for selector_name, selector in REMOVABLE_SELECTORS:
+            for element in selector(doc):
                 # Vérifier si l'élément contient du contenu significatif
-                text_content = element.get_text(strip=True)
+                text_content = get_text(element, strip=True)
                 
                 # Ignorer les éléments avec beaucoup de contenu textuel 
                 # (probablement du contenu principal mal classé)
-                if len(text_content) > 1000 and selector not in ['.ads', '.advertisement', '.cookie-notice', '.popup', '.modal']:
+                if len(text_content) > 1000 and selector_name not in ['.ads', '.advertisement', '.cookie-notice', '.popup', '.modal']:
                     # Ne pas supprimer - contient trop de contenu pour être juste un élément de navigation
                     continue
                 
-                element.decompose()
-        
-        # Supprimer tous les scripts
-        for script in soup.find_all('script'):
-            script.decompose()
+                drop(element)
         
-        # Supprimer tous les styles CSS
-        for style in soup.find_all('style'):
-            style.decompose()
-        
-        # Supprimer tous les noscript
-        for noscript in soup.find_all('noscript'):
-            noscript.decompose()
-            
-        # Supprimer tous les iframes
-        for iframe in soup.find_all('iframe'):
-            iframe.decompose()
+        # Supprimer tous les scripts, styles CSS, noscript et iframes
+        for element in list(doc.iter('script', 'style', 'noscript', 'iframe')):
+            drop(element)
             
         # Supprimer les attributs de style, onclick, onload, etc.
-        for tag in soup.find_all(True):
+        # (seuls les éléments portant l'un de ces attributs sont parcourus)
+        for tag in ELEMENTS_WITH_REMOVABLE_ATTRIBUTES(doc):
             # Créer une liste des attributs à supprimer
             attrs_to_remove = []
-            for attr in tag.attrs:
+            for attr in tag.attrib:
                 # Supprimer les attributs de style
                 if attr == 'style':
                     attrs_to_remove.append(attr)
@@ -209,215 +371,292 @@ class WebScraper:
                     attrs_to_remove.append(attr)
                 # Supprimer les classes qui pourraient indiquer des scripts/publicités
                 elif attr == 'class':
-                    classes = tag.get('class', [])
-                    if any(cls in ' '.join(classes) for cls in ['js-', 'ad-', 'ads-', 'script-', 'tracking']):
+                    classes = tag.get('class', '')
+                    if any(cls in classes for cls in ['js-', 'ad-', 'ads-', 'script-', 'tracking']):
                         attrs_to_remove.append(attr)
             
             # Supprimer les attributs identifiés
             for attr in attrs_to_remove:
-                del tag[attr]
+                del tag.attrib[attr]
         
-        return soup
+        return doc
 
-    def detect_nav_by_content(self, soup: BeautifulSoup) -> None:
+    @staticmethod
+    def compute_node_stats(doc: HtmlElement) -> Dict[HtmlElement, Tuple[int, int, int, int]]:
+        """
+        Calcule pour chaque élément, en un seul parcours ascendant de l'arbre, le nombre de liens,
+        le nombre de liens courts, la longueur du texte sans espaces superflus et la longueur du texte brut.
+        
+        Args:
+            doc: L'arbre lxml à analyser
+            
+        Returns:
+            Dictionnaire des statistiques (liens, liens courts, texte nettoyé, texte brut) par élément
+        """
+        stats = {}
+        # En ordre préfixe inversé, les descendants d'un élément sont toujours traités avant lui
+        for element in reversed(list(doc.iter(etree.Element))):
+            text = element.text or ''
+            links, short_links, stripped_length, length = 0, 0, len(text.strip()), len(text)
+            for child in element:
+                tail = child.tail or ''
+                stripped_length += len(tail.strip())
+                length += len(tail)
+                if is_element(child):
+                    child_links, child_short_links, child_stripped_length, child_length = stats[child]
+                    links += child_links
+                    short_links += child_short_links
+                    stripped_length += child_stripped_length
+                    length += child_length
+            if element.tag == 'a':
+                links += 1
+                # Un lien court est typique des menus
+                short_links += stripped_length < 20
+            stats[element] = (links, short_links, stripped_length, length)
+        return stats
+
+    @staticmethod
+    def is_navigation(element: HtmlElement, stats: Tuple[int, int, int, int]) -> bool:
+        """
+        Indique si un élément est un menu, une barre latérale ou une liste de liens à supprimer.
+        
+        Args:
+            element: L'élément à examiner
+            stats: Les statistiques de l'élément calculées par compute_node_stats
+            
+        Returns:
+            True si l'élément doit être supprimé
+        """
+        links, short_links, stripped_length, length = stats
+        
+        # Si un élément contient beaucoup de liens, c'est probablement un menu ou une barre latérale
+        # Augmenté le seuil de 5 à 8 liens pour être moins agressif
+        # Augmenté le seuil de 70% à 85% de liens courts pour être sûr que c'est vraiment un menu
+        if links > 8 and short_links > links * 0.85:
+            # Si le contenu textuel est substantiel par rapport au nombre de liens, ne pas supprimer
+            return stripped_length <= links * 50  # En moyenne 50 caractères de contenu par lien
+        
+        # Vérifier si c'est une liste de catégories, tags, etc., plus strict:
+        # seulement les petits éléments de navigation, dont le texte contient un terme de navigation
+        if links > 4 and length < 200:
+            element_text = get_text(element).lower()
+            return any(term in element_text for term in NAV_LIST_TERMS)
+        
+        return False
+
+    def detect_nav_by_content(self, doc: HtmlElement) -> None:
         """
         Détecte et supprime les éléments de navigation et barres latérales 
         en analysant leur contenu et leur position, de manière moins agressive.
         
         Args:
-            soup: L'objet BeautifulSoup à nettoyer
+            doc: L'arbre lxml à nettoyer
         """
-        # 1. Détecter les éléments qui contiennent de nombreux liens
-        all_divs = soup.find_all(['div', 'section', 'ul', 'ol'])
-        for element in all_divs:
-            links = element.find_all('a')
-            
-            # Si un élément contient beaucoup de liens, c'est probablement un menu ou une barre latérale
-            # Augmenté le seuil de 5 à 8 liens pour être moins agressif
-            if len(links) > 8:
-                # Vérifier si les liens sont courts (typique des menus)
-                short_links = [link for link in links if len(link.get_text(strip=True)) < 20]
-                
-                # Augmenté le seuil de 70% à 85% pour être sûr que c'est vraiment un menu
-                if len(short_links) > len(links) * 0.85:
-                    # Vérifier s'il contient du texte informatif substantiel
-                    text_content = element.get_text(strip=True)
-                    # Si le contenu textuel est substantiel par rapport au nombre de liens, ne pas supprimer
-                    if len(text_content) > len(links) * 50:  # En moyenne 50 caractères de contenu par lien
-                        continue
-                    element.decompose()
-                    continue
-            
-            # Vérifier si c'est une liste de catégories, tags, etc.
-            # Liste plus restreinte de termes pour être moins agressif
-            list_terms = ['menu', 'navigation', 'liens', 'links']
-            
-            # Vérifier le texte de l'élément pour des indices, plus strict
-            element_text = element.get_text().lower()
-            if any(term in element_text for term in list_terms) and len(links) > 4:
-                # Vérifier la proportion de texte vs liens
-                if len(element_text) < 200:  # Seulement supprimer les petits éléments de navigation
-                    element.decompose()
+        # 1. Détecter les éléments qui contiennent de nombreux liens, ou les listes de catégories, tags, etc.
+        # Les statistiques de chaque nœud sont calculées en un seul parcours ascendant,
+        # puis l'élagage se fait en un seul parcours descendant.
+        stats = self.compute_node_stats(doc)
+        to_drop = []
+        stack = [doc]
+        while stack:
+            element = stack.pop()
+            if element is not doc and element.tag in NAV_CONTAINER_TAGS and self.is_navigation(element, stats[element]):
+                # Le sous-arbre est supprimé, inutile d'examiner ses descendants
+                to_drop.append(element)
                 continue
+            stack.extend(reversed([child for child in element if is_element(child)]))
+        
+        for element in to_drop:
+            drop(element)
                 
         # 2. Détecter les éléments par leur position (uniquement la première div)
-        main_content = soup.find('body')
-        if main_content:
+        main_content = doc.find('body')
+        if main_content is not None:
             # Examiner seulement le premier enfant direct du body (souvent la navigation)
             # Réduit de 3 à 1 pour être moins agressif
-            children = list(main_content.children)
-            if children and len(children) > 0:
+            children = list(main_content)
+            # Un texte avant le premier élément (ou après le dernier) compte comme un enfant
+            if children and not main_content.text:
                 child = children[0]
-                if child.name in ['div', 'nav'] and not child.find(['h1', 'h2', 'article', 'p']):
+                if child.tag in ['div', 'nav'] and next(child.iterdescendants('h1', 'h2', 'article', 'p'), None) is None:
                     # Vérifier si c'est probablement une navigation sans contenu substantiel
-                    if child.find_all('a', limit=5) and len(child.get_text(strip=True)) < 200:
-                        child.decompose()
+                    if next(child.iterdescendants('a'), None) is not None and len(get_text(child, strip=True)) < 200:
+                        drop(child)
                 
             # Examiner uniquement le dernier enfant direct du body (souvent le footer)
             # Réduit à seulement le dernier enfant
-            if len(children) > 0:
+            if children and not children[-1].tail and children[-1].getparent() is not None:
                 child = children[-1]
-                if child.name in ['div', 'footer'] and not child.find(['h1', 'h2', 'article']):
-                    if 'copyright' in child.get_text().lower() or (
-                        child.find_all('a', limit=3) and len(child.get_text(strip=True)) < 150):
-                        child.decompose()
+                if child.tag in ['div', 'footer'] and next(child.iterdescendants('h1', 'h2', 'article'), None) is None:
+                    if 'copyright' in get_text(child).lower() or (
+                        next(child.iterdescendants('a'), None) is not None and len(get_text(child, strip=True)) < 150):
+                        drop(child)
         
         # 3. Supprimer les éléments qui ont une largeur très réduite (sidebars)
         # Réduit de 40% à 25% pour être moins agressif
-        for element in soup.find_all(True):
-            if 'style' in element.attrs:
-                style = element['style'].lower()
+        for element in STYLED_ELEMENTS(doc):
+            if element.getparent() is not None:
+                style = element.get('style').lower()
                 if 'width' in style:
                     # Seulement si la largeur est très petite (moins de 25%)
                     width_match = re.search(r'width\s*:\s*(\d+)%', style)
                     if width_match and int(width_match.group(1)) < 25:
                         # Vérifier qu'il s'agit bien d'un élément de navigation
-                        if element.find_all('a', limit=4) and not element.find(['p', 'article']) and len(element.get_text(strip=True)) < 300:
-                            element.decompose()
+                        if (next(element.iterdescendants('a'), None) is not None
+                                and next(element.iterdescendants('p', 'article'), None) is None
+                                and len(get_text(element, strip=True)) < 300):
+                            drop(element)
+
+    def clean_document(self, doc: HtmlElement) -> HtmlElement:
+        """
+        Nettoie un document déjà parsé en utilisant readability-lxml pour extraire le contenu principal.
+        Le même arbre sert à l'extraction du titre, au nettoyage et à Readability, sans nouveau parsing
+        de la page. L'arbre fourni est modifié.
+        
+        Args:
+            doc: L'arbre lxml de la page
+            
+        Returns:
+            Un nouvel arbre lxml avec le titre et le contenu principal
+        """
+        # Extraire le titre
+        title = doc.findtext('.//title') or "Sans titre"
+        
+        # Utiliser Readability pour extraire le contenu principal, sur une copie de l'arbre:
+        # son analyse supprime en place les éléments masqués (hidden, display:none)
+        readability_doc = Document(copy.deepcopy(doc))
+        clean_html = readability_doc.summary()
+        readability_title = readability_doc.title()
+        
+        # Si le titre de Readability est plus informatif, l'utiliser
+        if readability_title and len(readability_title) > len(title):
+            title = readability_title
+        
+        # Récupérer la longueur du contenu original pour analyse
+        original_content_length = len(get_text(doc, strip=True))
+        
+        # Supprimer les headers, footers et autres éléments non désirés
+        doc = self.remove_headers_footers(doc)
+        
+        # Récupérer la longueur du contenu après première passe de nettoyage
+        post_header_footer_length = len(get_text(doc, strip=True))
+        
+        # Si on a déjà perdu plus de 30% du contenu, on ne fait pas de détection avancée
+        # qui risquerait de trop supprimer de contenu
+        if post_header_footer_length > original_content_length * 0.7:
+            # Détection avancée des éléments de navigation par leur contenu
+            self.detect_nav_by_content(doc)
+        
+        # Parser le HTML nettoyé par Readability
+        clean_doc = parse_html(clean_html)
+        
+        # Récupérer la longueur du contenu extrait par Readability
+        readability_content_length = len(get_text(clean_doc, strip=True))
+        
+        # Nettoyer aussi les headers et footers du contenu extrait par Readability
+        clean_doc = self.remove_headers_footers(clean_doc)
+        
+        # Appliquer la détection avancée uniquement si le contenu est conséquent
+        # et on ne veut pas trop perdre de contenu
+        if readability_content_length > 1000:
+            self.detect_nav_by_content(clean_doc)
+        
+        clean_body = clean_doc.find('body')
+        if clean_body is None:
+            clean_body = clean_doc
+        
+        # Vérifier si le contenu extrait est suffisant
+        clean_text = get_text(clean_doc)
+        if len(clean_text) < 500:  # Si moins de 500 caractères, c'est probablement incomplet
+            # Extraire du contenu supplémentaire
+            additional_elements = self.extract_additional_content(doc)
+            if additional_elements:
+                # Créer un nouvel élément div pour contenir le contenu supplémentaire
+                div_tag = E.div({'class': 'additional-content'}, *additional_elements)
+                
+                # Nettoyer également ce contenu supplémentaire
+                self.remove_headers_footers(div_tag)
+                self.detect_nav_by_content(div_tag)
+                
+                clean_body.append(div_tag)
+        
+        # Construire un HTML propre avec le titre et le contenu
+        heading = E.h1(title)
+        heading.tail = clean_body.text
+        body = E.body(heading, *clean_body)
+        return E.html(E.head(E.title(title)), body)
 
-    def clean_html(self, html_content: str) -> str:
+    def clean_html(self, html_content: Union[str, HtmlElement]) -> str:
         """
         Nettoie le HTML en utilisant readability-lxml pour extraire le contenu principal.
         Version moins agressive pour préserver plus de contenu original.
         
         Args:
-            html_content: Le contenu HTML brut
+            html_content: Le contenu HTML brut ou son arbre lxml déjà parsé
             
         Returns:
             Le HTML nettoyé avec le contenu principal
         """
         try:
-            # Parser le HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Récupérer la longueur du contenu original pour analyse
-            original_content_length = len(soup.get_text(strip=True))
-            
-            # Supprimer les headers, footers et autres éléments non désirés
-            soup = self.remove_headers_footers(soup)
-            
-            # Récupérer la longueur du contenu après première passe de nettoyage
-            post_header_footer_length = len(soup.get_text(strip=True))
-            
-            # Si on a déjà perdu plus de 30% du contenu, on ne fait pas de détection avancée
-            # qui risquerait de trop supprimer de contenu
-            if post_header_footer_length > original_content_length * 0.7:
-                # Détection avancée des éléments de navigation par leur contenu
-                self.detect_nav_by_content(soup)
-            
-            # Extraire le titre
-            title = soup.title.string if soup.title else "Sans titre"
-            
-            # Utiliser Readability pour extraire le contenu principal
-            doc = Document(html_content)
-            clean_html = doc.summary()
-            readability_title = doc.title()
-            
-            # Si le titre de Readability est plus informatif, l'utiliser
-            if readability_title and len(readability_title) > len(title):
-                title = readability_title
-            
-            # Parser le HTML nettoyé par Readability
-            clean_soup = BeautifulSoup(clean_html, 'html.parser')
-            
-            # Récupérer la longueur du contenu extrait par Readability
-            readability_content_length = len(clean_soup.get_text(strip=True))
-            
-            # Nettoyer aussi les headers et footers du contenu extrait par Readability
-            clean_soup = self.remove_headers_footers(clean_soup)
-            
-            # Appliquer la détection avancée uniquement si le contenu est conséquent
-            # et on ne veut pas trop perdre de contenu
-            if readability_content_length > 1000:
-                self.detect_nav_by_content(clean_soup)
-            
-            # Vérifier si le contenu extrait est suffisant
-            clean_text = clean_soup.get_text()
-            if len(clean_text) < 500:  # Si moins de 500 caractères, c'est probablement incomplet
-                # Extraire du contenu supplémentaire
-                additional_content = self.extract_additional_content(soup)
-                if additional_content:
-                    # Ajouter ce contenu au HTML nettoyé
-                    additional_soup = BeautifulSoup(additional_content, 'html.parser')
-                    
-                    # Nettoyer également ce contenu supplémentaire
-                    additional_soup = self.remove_headers_footers(additional_soup)
-                    self.detect_nav_by_content(additional_soup)
-                    
-                    # Créer un nouvel élément div pour contenir le contenu supplémentaire
-                    div = BeautifulSoup("<div class='additional-content'></div>", 'html.parser')
-                    div_tag = div.div
-                    
-                    # Ajouter chaque élément de contenu supplémentaire
-                    for element in additional_soup.children:
-                        if element.name:  # Ignorer les nœuds de texte
-                            div_tag.append(element)
-                    
-                    clean_soup.body.append(div_tag)
-                    clean_html = str(clean_soup)
-            
-            # Construire un HTML propre avec le titre et le contenu
-            full_html = f"<html><head><title>{title}</title></head><body><h1>{title}</h1>{clean_html}</body></html>"
-            
-            return full_html
+            doc = parse_html(html_content) if isinstance(html_content, str) else html_content
+            return to_html(self.clean_document(doc))
         except Exception as e:
             logger.error(f"Erreur lors du nettoyage du HTML: {str(e)}")
             # En cas d'erreur, retourner le HTML original
-            return html_content
+            return html_content if isinstance(html_content, str) else to_html(html_content)
     
-    def get_text_content(self, html_content: str) -> str:
+    def get_text_content(self, html_content: Union[str, HtmlElement]) -> str:
         """
         Extrait le texte brut à partir du HTML.
         
         Args:
-            html_content: Le contenu HTML
+            html_content: Le contenu HTML ou son arbre lxml déjà parsé
             
         Returns:
             Le texte extrait sans balises HTML
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
+        doc = parse_html(html_content) if isinstance(html_content, str) else html_content
         
-        # Supprimer les scripts et styles qui ne contiennent pas de contenu utile
-        for script_or_style in soup(['script', 'style', 'meta', 'noscript']):
-            script_or_style.decompose()
-        
-        # Obtenir le texte avec des sauts de ligne entre les éléments
-        text = soup.get_text(separator='\n', strip=True)
+        # Obtenir le texte avec des sauts de ligne entre les éléments,
+        # sans les scripts et styles qui ne contiennent pas de contenu utile
+        text = get_text(doc, separator='\n', strip=True, skip_tags=['script', 'style', 'meta', 'noscript'])
         
         # Nettoyer les sauts de ligne multiples
         text = re.sub(r'\n{3,}', '\n\n', text)
         
         return text
     
-    def scrape(self, url: str, clean: bool = True, extract_text: bool = False) -> Dict[str, Union[str, None]]:
+    def scrape(self, url: str, clean: bool = True, extract_text: bool = False) -> Dict[str, Union[str, HtmlElement, None]]:
         """
         Scrape une URL et retourne différentes versions du contenu.
+        La page n'est parsée qu'une fois: l'arbre lxml est partagé par l'extraction du titre,
+        le nettoyage, Readability et l'extraction du texte.
         
         Args:
             url: L'URL à scraper
             clean: Si True, nettoie le HTML
             extract_text: Si True, extrait également le texte brut
             
+        Returns:
+            Dictionnaire contenant les différentes formes du contenu
+            (clean_tree contient l'arbre lxml du HTML nettoyé, réutilisable par le convertisseur)
+        """
+        # Récupération du HTML
+        html_content = self.fetch_url(url)
+        return self.scrape_html(url, html_content, clean, extract_text)
+    
+    def scrape_html(self, url: str, html_content: Optional[str], clean: bool = True,
+                    extract_text: bool = False) -> Dict[str, Union[str, HtmlElement, None]]:
+        """
+        Produit les différentes versions du contenu d'une page déjà récupérée
+        (par exemple par le backend asynchrone).
+        
+        Args:
+            url: L'URL de la page
+            html_content: Le contenu HTML, ou None si la récupération a échoué
+            clean: Si True, nettoie le HTML
+            extract_text: Si True, extrait également le texte brut
+            
         Returns:
             Dictionnaire contenant les différentes formes du contenu
         """
@@ -425,41 +664,51 @@ class WebScraper:
             "url": url,
             "raw_html": None,
             "clean_html": None,
+            "clean_tree": None,
             "text_content": None,
             "title": None,
         }
         
-        # Récupération du HTML
-        html_content = self.fetch_url(url)
         if not html_content:
             return result
         
         result["raw_html"] = html_content
         
-        # Extraction du titre
+        # Parsing unique de la page
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            result["title"] = soup.title.string.strip() if soup.title else None
+            doc = parse_html(html_content)
         except Exception as e:
-            logger.error(f"Erreur lors de l'extraction du titre: {str(e)}")
-            pass
+            logger.error(f"Erreur lors du parsing du HTML: {str(e)}")
+            return result
+        
+        # Extraction du titre
+        title = doc.findtext('.//title')
+        result["title"] = title.strip() if title is not None else None
         
         # Nettoyage du HTML si demandé
         if clean:
-            result["clean_html"] = self.clean_html(html_content)
+            try:
+                result["clean_tree"] = self.clean_document(doc)
+                result["clean_html"] = to_html(result["clean_tree"])
+            except Exception as e:
+                logger.error(f"Erreur lors du nettoyage du HTML: {str(e)}")
+                # En cas d'erreur, conserver le HTML original
+                result["clean_html"] = html_content
         
         # Extraction du texte si demandé
         if extract_text:
-            if result["clean_html"]:
+            if result["clean_tree"] is not None:
+                result["text_content"] = self.get_text_content(result["clean_tree"])
+            elif result["clean_html"]:
                 result["text_content"] = self.get_text_content(result["clean_html"])
             else:
-                result["text_content"] = self.get_text_content(html_content)
+                result["text_content"] = self.get_text_content(doc)
         
         return result
 
 
 # Fonction pratique pour une utilisation rapide
-def scrape_url(url: str, clean: bool = True, extract_text: bool = False) -> Dict[str, Union[str, None]]:
+def scrape_url(url: str, clean: bool = True, extract_text: bool = False) -> Dict[str, Union[str, HtmlElement, None]]:
     """
     Fonction utilitaire pour scraper rapidement une URL.
     
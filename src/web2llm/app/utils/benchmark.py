@@ -0,0 +1,325 @@
+"""
+Mesures de performance du convertisseur.
+
+Compare MarkdownConverter.clean_markdown à l'implémentation d'origine (une suite de re.sub non
+compilés), qui doivent produire exactement le même texte, et le rendu direct de l'arbre à la
+conversion par html2markdown, après avoir vérifié que le rendu direct conserve la structure du
+document. À lancer avec:
+
+    python -m src.web2llm.app.utils.benchmark
+"""
+import re
+import random
+import time
+from typing import Dict, List, Optional
+
+from html2markdown import convert
+
+from src.web2llm.app.converter.converter import MarkdownConverter, conversion_metrics
+from src.web2llm.app.converter.renderer import render_markdown
+from src.web2llm.app.utils.html import parse_html, to_html
+
+
+def legacy_clean_markdown(markdown_content: str) -> str:
+    """
+    Implémentation d'origine de MarkdownConverter.clean_markdown, conservée comme référence.
+
+    Args:
+        markdown_content: Le contenu Markdown
+
+    Returns:
+        Markdown nettoyé
+    """
+    markdown_content = re.sub(r'\n{3,}', '\n\n', markdown_content)
+    markdown_content = re.sub(r'\[(.+?)\]\s*\[\]', r'\1', markdown_content)
+    markdown_content = re.sub(r'<script[^>]*>[\s\S]*?</script>', '', markdown_content)
+    markdown_content = re.sub(r'<style[^>]*>[\s\S]*?</style>', '', markdown_content)
+    markdown_content = re.sub(r'<!\[CDATA\[[\s\S]*?\]\]>', '', markdown_content)
+    markdown_content = re.sub(r'</?[a-zA-Z][^>]*>', '', markdown_content)
+    markdown_content = re.sub(r'<br\s*/?>',  '\n', markdown_content)
+    markdown_content = re.sub(r' {2,}', ' ', markdown_content)
+    markdown_content = re.sub(r'<([a-z0-9]+)(?:\s+[a-z0-9-]+(?:=(?:"[^"]*"|\'[^\']*\'))?)*\s*>', '', markdown_content)
+    markdown_content = re.sub(r'</[a-z0-9]+>', '', markdown_content)
+    markdown_content = re.sub(r'<!--[\s\S]*?-->', '', markdown_content)
+    markdown_content = re.sub(r'&[a-zA-Z]+;', ' ', markdown_content)
+    markdown_content = re.sub(r'```(?:javascript|js|css|style)[\s\S]*?```', '', markdown_content)
+    markdown_content = re.sub(r'^[a-z-]+:\s*[^;]+;\s*$', '', markdown_content, flags=re.MULTILINE)
+    markdown_content = re.sub(r'^var\s+[a-zA-Z0-9_$]+\s*=', '', markdown_content, flags=re.MULTILINE)
+    markdown_content = re.sub(r'^function\s+[a-zA-Z0-9_$]+\s*\(', '', markdown_content, flags=re.MULTILINE)
+    markdown_content = re.sub(r'^const\s+[a-zA-Z0-9_$]+\s*=', '', markdown_content, flags=re.MULTILINE)
+    markdown_content = re.sub(r'^let\s+[a-zA-Z0-9_$]+\s*=', '', markdown_content, flags=re.MULTILINE)
+    markdown_content = re.sub(r'^\s*[{}]\s*$', '', markdown_content, flags=re.MULTILINE)
+    markdown_content = re.sub(r' {2,}', ' ', markdown_content)
+    markdown_content = re.sub(r'\n{3,}', '\n\n', markdown_content)
+    markdown_content = re.sub(r'^\s*[;:.,_\-*+#]+\s*$', '', markdown_content, flags=re.MULTILINE)
+    return markdown_content.strip()
+
+
+# Fragments assemblés aléatoirement pour produire des documents de test: Markdown ordinaire,
+# restes de HTML, code, et cas limites où la suppression d'un motif en fait apparaître un autre
+SAMPLE_FRAGMENTS = [
+    "# Titre de la page\n\n",
+    "Un paragraphe de texte ordinaire, avec une [référence](https://example.com) et du **gras**.\n",
+    "Une ligne  avec   des espaces   multiples.\n",
+    "- élément de liste\n- autre élément\n\n\n\n",
+    "| Colonne | Valeur |\n|---|---|\n| a | 1 |\n",
+    "```python\nprint('bonjour')\n```\n",
+    "```javascript\nvar x = 1;\n```\n",
+    "<div class=\"wrapper\"><p>Texte dans du HTML</p></div>\n",
+    "<script type=\"text/javascript\">var tracker = {id: 1};</script>\n",
+    "<style>.menu { color: red; }</style>\n",
+    "<![CDATA[ function f() {} ]]>\n",
+    "<!-- commentaire -->\n",
+    "Texte&nbsp;insécable &amp; entités.\n",
+    "color: red;\n",
+    "var total = 42;\n",
+    "function init(options) {\n",
+    "}\n",
+    "const API = 'x';\nlet count = 0;\n",
+    "[Lien vide] []\n",
+    "---\n;;;\n",
+    "<<b>br>\n",
+    "<1>chiffres</1>\n",
+    "var\nx =function f(\n",
+    "function\nvar x =f(\n",
+    "<style><script></style>x</script>\n",
+    "<br/>  <br >\n",
+]
+
+
+def generate_sample(size: int, seed: int = 0) -> str:
+    """
+    Génère un document Markdown de test.
+
+    Args:
+        size: Taille approximative du document, en caractères
+        seed: Graine du générateur aléatoire
+
+    Returns:
+        Le document
+    """
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        fragment = rng.choice(SAMPLE_FRAGMENTS)
+        parts.append(fragment)
+        length += len(fragment)
+    return "".join(parts)
+
+
+def generate_page(sections: int, seed: int = 0) -> str:
+    """
+    Génère une page HTML de test (navigation, titres, paragraphes, listes, code et tableaux).
+
+    Args:
+        sections: Nombre de sections de la page
+        seed: Graine du générateur aléatoire
+
+    Returns:
+        Le HTML de la page
+    """
+    rng = random.Random(seed)
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+    parts = ["<html><head><title>Page de test</title></head><body>",
+             "<nav><ul>" + "".join(f'<li><a href="/p{i}">Lien {i}</a></li>' for i in range(10)) + "</ul></nav>",
+             "<main><article><h1>Titre principal</h1>"]
+    for index in range(sections):
+        text = " ".join(rng.choice(words) for _ in range(60))
+        parts.append(f'<section><h2>Section {index}</h2><p>{text} <a href="/ref/{index}">référence</a> <b>gras</b></p>')
+        parts.append("<ul>" + "".join(f"<li>{rng.choice(words)}</li>" for _ in range(4)) + "</ul>")
+        parts.append("<pre><code>def f(x):\n    return x &lt; 2</code></pre>")
+        parts.append(f"<table><tr><th>Nom</th><th>Valeur</th></tr><tr><td>{index}</td><td>{text[:20]}</td></tr></table></section>")
+    parts.append("</article></main></body></html>")
+    return "".join(parts)
+
+
+def generate_converted_page(sections: int, seed: int = 0) -> str:
+    """
+    Génère le Markdown brut produit par html2markdown pour une page de test, tel que clean_markdown le reçoit.
+
+    Args:
+        sections: Nombre de sections de la page
+        seed: Graine du générateur aléatoire
+
+    Returns:
+        Le Markdown non nettoyé (avec le HTML brut laissé par html2markdown)
+    """
+    converter = MarkdownConverter()
+    return convert(to_html(converter.pre_process_html(parse_html(generate_page(sections, seed)))))
+
+
+def measure(function, samples: List, repeat: int) -> float:
+    """
+    Mesure la durée du traitement de tous les échantillons (meilleure de plusieurs répétitions).
+
+    Args:
+        function: La fonction appliquée à chaque échantillon
+        samples: Les échantillons
+        repeat: Nombre de répétitions de la mesure
+
+    Returns:
+        La durée, en secondes
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for sample in samples:
+            function(sample)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_clean_markdown(samples: Optional[List[str]] = None, repeat: int = 5) -> Dict[str, float]:
+    """
+    Compare le nettoyage du Markdown à l'implémentation d'origine.
+    Les deux implémentations doivent produire le même texte sur les documents mesurés et sur des
+    documents générés à partir de SAMPLE_FRAGMENTS. Ces derniers ne sont pas mesurés: chaque motif
+    y apparaît, aucune règle ne peut donc être sautée et ils ne représentent pas une page réelle.
+
+    Args:
+        samples: Les documents à nettoyer (par défaut, le Markdown brut de pages converties par
+            html2markdown, de 15 Ko à 1,5 Mo)
+        repeat: Nombre de répétitions de la mesure
+
+    Returns:
+        Dictionnaire contenant la durée de chaque implémentation (secondes) et le gain
+
+    Raises:
+        AssertionError: Si les deux implémentations ne produisent pas le même texte
+    """
+    if samples is None:
+        samples = [generate_converted_page(sections, seed) for seed, sections in enumerate((20, 100, 500, 2000))]
+    checked = samples + [generate_sample(size, seed) for seed, size in enumerate((1_000, 10_000, 100_000, 1_000_000))]
+
+    converter = MarkdownConverter()
+    for index, sample in enumerate(checked):
+        assert converter.clean_markdown(sample) == legacy_clean_markdown(sample), \
+            f"Résultat différent de l'implémentation d'origine pour le document {index}"
+
+    legacy = measure(legacy_clean_markdown, samples, repeat)
+    current = measure(converter.clean_markdown, samples, repeat)
+    return {
+        "legacy_seconds": legacy,
+        "current_seconds": current,
+        "speedup": legacy / current if current else float('inf'),
+    }
+
+
+def benchmark_renderer(pages: Optional[List[str]] = None, repeat: int = 3) -> Dict[str, float]:
+    """
+    Compare le rendu direct de l'arbre (MarkdownRenderer) à la conversion par html2markdown,
+    sur des documents déjà parsés et pré-traités, chacun suivi du traitement que lui applique
+    html_to_markdown (clean_markdown pour html2markdown, normalize_markdown pour le rendu direct).
+
+    Args:
+        pages: Les pages HTML à convertir (par défaut, des pages générées de 20 à 500 sections)
+        repeat: Nombre de répétitions de la mesure
+
+    Returns:
+        Dictionnaire contenant la durée de chaque conversion (secondes, nettoyage ou normalisation compris) et le gain
+    """
+    if pages is None:
+        pages = [generate_page(sections, seed) for seed, sections in enumerate((20, 100, 500))]
+
+    converter = MarkdownConverter()
+    docs = [converter.pre_process_html(parse_html(page)) for page in pages]
+    html2markdown = measure(lambda doc: converter.clean_markdown(convert(to_html(doc))), docs, repeat)
+    renderer = measure(lambda doc: converter.normalize_markdown(render_markdown(doc)), docs, repeat)
+    return {
+        "html2markdown_seconds": html2markdown,
+        "renderer_seconds": renderer,
+        "speedup": html2markdown / renderer if renderer else float('inf'),
+    }
+
+
+# Page dont la structure doit traverser le rendu direct sans modification: code indenté avec
+# accolades et déclarations, texte ressemblant à du HTML et liste imbriquée
+STRUCTURE_PAGE = """<html><head><title>Structure</title></head><body><h1>Guide</h1>
+<p>Utiliser la balise &lt;div class=x&gt; et a&lt;b&gt;c.</p>
+<pre><code>function f(a) {
+    if (a) {
+        return x;
+    }
+}
+color: red;
+var y = 1;</code></pre>
+<ul><li>un<ul><li>imbriqué a</li><li>imbriqué b</li></ul></li><li>deux</li></ul>
+</body></html>"""
+
+STRUCTURE_MARKDOWN = """# Guide
+
+Utiliser la balise <div class=x> et a<b>c.
+
+```
+function f(a) {
+    if (a) {
+        return x;
+    }
+}
+color: red;
+var y = 1;
+```
+
+* un
+  * imbriqué a
+  * imbriqué b
+* deux"""
+
+
+def check_markdown_structure() -> None:
+    """
+    Vérifie que html_to_markdown et iter_markdown conservent le code, le texte ressemblant à du
+    HTML et les listes imbriquées d'une page convertie par le rendu direct.
+
+    Raises:
+        AssertionError: Si le Markdown produit diffère du Markdown attendu
+    """
+    converter = MarkdownConverter()
+    markdown_content = converter.html_to_markdown(STRUCTURE_PAGE)
+    assert markdown_content == f"# Structure\n\n{STRUCTURE_MARKDOWN}", \
+        f"Structure modifiée par html_to_markdown:\n{markdown_content}"
+    sections = ''.join(converter.iter_markdown(STRUCTURE_PAGE)).strip()
+    assert sections == STRUCTURE_MARKDOWN, f"Structure modifiée par iter_markdown:\n{sections}"
+
+
+def benchmark_conversion_paths(pages: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Convertit des pages avec html_to_markdown et retourne la répartition des méthodes de conversion choisies.
+
+    Args:
+        pages: Les pages HTML à convertir (par défaut, des pages générées et une page au balisage simple)
+
+    Returns:
+        Les compteurs de conversion_metrics (nombre, part et durée des conversions de chaque méthode)
+    """
+    if pages is None:
+        simple_page = ("<html><head><title>Page simple</title></head><body><h1>Titre</h1>"
+                       "<p>Texte avec un <a href=\"/lien\">lien</a>.</p><ul><li>un</li><li>deux</li></ul></body></html>")
+        pages = [generate_page(sections, seed) for seed, sections in enumerate((20, 100, 500))] + [simple_page]
+
+    converter = MarkdownConverter()
+    for page in pages:
+        converter.html_to_markdown(page)
+    return conversion_metrics.stats()
+
+
+if __name__ == "__main__":
+    check_markdown_structure()
+    print("Structure du Markdown conservée par le rendu direct")
+
+    results = benchmark_clean_markdown()
+    print("Nettoyage du Markdown converti par html2markdown")
+    print(f"  Implémentation d'origine: {results['legacy_seconds'] * 1000:.1f} ms")
+    print(f"  Implémentation actuelle:  {results['current_seconds'] * 1000:.1f} ms")
+    print(f"  Gain: x{results['speedup']:.2f}")
+
+    results = benchmark_renderer()
+    print("Conversion en Markdown")
+    print(f"  html2markdown:      {results['html2markdown_seconds'] * 1000:.1f} ms")
+    print(f"  MarkdownRenderer:   {results['renderer_seconds'] * 1000:.1f} ms")
+    print(f"  Gain: x{results['speedup']:.2f}")
+
+    print("Méthodes de conversion choisies par html_to_markdown")
+    for method, stats in benchmark_conversion_paths().items():
+        print(f"  {method}: {stats['count']} conversions ({stats['share']:.0%}), {stats['average_ms']:.1f} ms en moyenne")
@@ -0,0 +1,140 @@
+"""
+Utilitaires partagés pour manipuler un document HTML parsé une seule fois avec lxml.
+"""
+from typing import Iterator, Iterable
+import lxml.html
+from lxml import etree
+from lxml.html import HtmlElement
+
+# Parser UTF-8 partagé (comme readability-lxml, pour accepter les déclarations d'encodage)
+_utf8_parser = lxml.html.HTMLParser(encoding='utf-8')
+
+
+def parse_html(html_content: str) -> HtmlElement:
+    """
+    Parse du HTML en arbre lxml.
+
+    Args:
+        html_content: Le contenu HTML
+
+    Returns:
+        L'élément racine du document
+    """
+    return lxml.html.document_fromstring(
+        html_content.encode('utf-8', 'replace'), parser=_utf8_parser)
+
+
+def to_html(element: HtmlElement) -> str:
+    """
+    Sérialise un arbre lxml en HTML.
+
+    Args:
+        element: L'élément à sérialiser
+
+    Returns:
+        Le HTML de l'élément
+    """
+    return lxml.html.tostring(element, encoding='unicode')
+
+
+def is_element(node) -> bool:
+    """Indique si le nœud est une balise (et non un commentaire ou une instruction)."""
+    return isinstance(node.tag, str)
+
+
+def iter_strings(element: HtmlElement, skip_tags: Iterable[str] = ()) -> Iterator[str]:
+    """
+    Itère sur les textes contenus dans un élément, dans l'ordre du document.
+
+    Args:
+        element: L'élément à parcourir
+        skip_tags: Balises dont le contenu est ignoré
+
+    Returns:
+        Un itérateur sur les textes
+    """
+    if not skip_tags:
+        yield from element.itertext()
+        return
+
+    skip_tags = set(skip_tags)
+    stack = [(element, False)]
+    while stack:
+        node, is_tail = stack.pop()
+        if is_tail:
+            if node.tail:
+                yield node.tail
+            continue
+        if is_element(node) and node.tag not in skip_tags:
+            if node.text:
+                yield node.text
+            for child in reversed(node):
+                stack.append((child, True))
+                stack.append((child, False))
+
+
+def get_text(element: HtmlElement, separator: str = '', strip: bool = False,
+             skip_tags: Iterable[str] = ()) -> str:
+    """
+    Équivalent de BeautifulSoup.get_text pour un élément lxml.
+
+    Args:
+        element: L'élément dont on veut le texte
+        separator: Séparateur entre les textes
+        strip: Si True, supprime les espaces autour des textes et ignore les textes vides
+        skip_tags: Balises dont le contenu est ignoré
+
+    Returns:
+        Le texte de l'élément
+    """
+    strings = iter_strings(element, skip_tags)
+    if strip:
+        strings = (s.strip() for s in strings)
+        strings = (s for s in strings if s)
+    return separator.join(strings)
+
+
+def drop(element: HtmlElement) -> None:
+    """Supprime un élément et son contenu en conservant le texte qui le suit."""
+    if element.getparent() is not None:
+        element.drop_tree()
+
+
+def wrap(element: HtmlElement, wrapper: HtmlElement) -> HtmlElement:
+    """
+    Enveloppe un élément dans un nouvel élément placé à sa position.
+
+    Args:
+        element: L'élément à envelopper
+        wrapper: L'élément enveloppant (vide)
+
+    Returns:
+        L'élément enveloppant
+    """
+    element.addprevious(wrapper)
+    wrapper.tail, element.tail = element.tail, None
+    wrapper.append(element)
+    return wrapper
+
+
+def selector_to_xpath(selector: str) -> etree.XPath:
+    """
+    Convertit un sélecteur CSS simple (balise, #id, .classe ou [attribut="valeur"]) en XPath.
+
+    Args:
+        selector: Le sélecteur CSS
+
+    Returns:
+        L'expression XPath compilée
+    """
+    if selector.startswith('#'):
+        expression = f"descendant-or-self::*[@id='{selector[1:]}']"
+    elif selector.startswith('.'):
+        expression = ("descendant-or-self::*[contains(concat(' ', normalize-space(@class), ' '), "
+                      f"' {selector[1:]} ')]")
+    elif selector.startswith('['):
+        name, value = selector[1:-1].split('=', 1)
+        expression = f"descendant-or-self::*[@{name}='{value.strip(chr(34) + chr(39))}']"
+    else:
+        expression = f"descendant-or-self::{selector}"
+    return etree.XPath(expression)
@@ -2,8 +2,8 @@ import gradio as gr
 import pandas as pd
 import json
 import os
-import time
 import re
+import asyncio
 from rich.console import Console
 from rich.panel import Panel
 
@@ -13,7 +13,98 @@ from src.utils import (
     get_file,
     load_in_vector_db,
 )
-from src.inference import Agent
+from src.utils.mistral_client import aclose_mistral_client
+from src.inference import Agent, MAX_CONCURRENT_TASKS
+
+
+async def solve_task(item, console):
+    """
+    Runs the agent on a single question.
+    Args:
+        item (dict): The question as returned by the API.
+        console (Console): The console used to display progress.
+    Returns:
+        tuple: The results log entry and the answer payload entry (None when the agent failed).
+    """
+    task_id = item.get("task_id")
+    question_text = item.get("question")
+    file_name = item.get("file_name")
+
+    if not task_id or question_text is None:
+        return None, None
+
+    if file_name != "":
+        file_path = await asyncio.to_thread(get_file, task_id)
+        file_context = f" You can access to the file here: '{file_path}'."
+    else:
+        file_context = ""
+
+    try:
+        console.rule(f"\n[bold blue]Task ID: {task_id}")
+        console.print(Panel(f"[bold]Question[/bold]\n{question_text}{file_context}", expand=False))
+
+        with open('./metadata.jsonl', 'r') as file:
+            for line in file:
+                item = json.loads(line)
+                if item.get('task_id') == task_id:
+                    final_answer = item.get('Final answer')
+
+        agent = Agent()
+        submitted_answer = await agent.arun(
+            input=question_text + file_context,
+            task_id=task_id,
+            truth=final_answer
+        )
+
+        if submitted_answer == final_answer:
+            try:
+                await asyncio.to_thread(
+                    load_in_vector_db,
+                    markdown_content=f"{question_text}{file_context}\n\nFINAL ANSWER:{submitted_answer}",
+                    #metadatas={
+                    #    "task_id": task_id,
+                    #    "question": question_text,
+                    #    "file_name": file_name,
+                    #},
+                )
+                console.print(f"Correct answer vectorized and stored")
+            except Exception as e:
+                console.print(f"Error loading in vector DB: {e}", style="bold red")
+
+        console.print(Panel(f"[bold green]Submitted Answer[/bold green]\n{submitted_answer}", expand=False))
+        console.print(Panel(f"The correct final answer is: [bold]{final_answer}[/bold]"))
+
+        return (
+            {"Task ID": task_id, "Question": question_text, "Submitted Answer": submitted_answer},
+            {"task_id": task_id, "submitted_answer": submitted_answer},
+        )
+
+    except Exception as e:
+        console.print(f"Error: {e}", style="bold red")
+        return {"Task ID": task_id, "Question": question_text, "Submitted Answer": f"AGENT ERROR: {e}"}, None
+
+
+async def solve_all(questions_data, console):
+    """
+    Runs the agent on every question, at most MAX_CONCURRENT_TASKS at a time, then closes the
+    Mistral connections opened in this event loop.
+    Args:
+        questions_data (list): The questions as returned by the API.
+        console (Console): The console used to display progress.
+    Returns:
+        list: The outcome of each question, in the original order.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TASKS)
+
+    async def bounded_solve(item):
+        async with semaphore:
+            return await solve_task(item, console)
+
+    try:
+        return await asyncio.gather(*(bounded_solve(item) for item in questions_data))
+    finally:
+        await aclose_mistral_client()
+
 
 def run_and_submit_all(profile: gr.OAuthProfile | None):
     console = Console()
@@ -34,69 +125,13 @@ def run_and_submit_all(profile: gr.OAuthProfile | None):
     if not questions_data:
         return "Failed to fetch questions.", None
 
-    results_log = []
-    answers_payload = []
-
     #chosen_task_id = "f918266a-b3e0-4914-865d-4faa564f1aef"
     #questions_data = [item for item in questions_data if item.get("task_id") == chosen_task_id]
 
-    for item in questions_data:
-
-        task_id = item.get("task_id")
-        question_text = item.get("question")
-        file_name = item.get("file_name")
-
-        if not task_id or question_text is None:
-            continue
-
-        if file_name != "":
-            file_path = get_file(task_id)
-            file_context = f" You can access to the file here: '{file_path}'."
-        else:
-            file_context = ""
-
-        try:
-            console.rule(f"\n[bold blue]Task ID: {task_id}")
-            console.print(Panel(f"[bold]Question[/bold]\n{question_text}{file_context}", expand=False))
-
-            with open('./metadata.jsonl', 'r') as file:
-                for line in file:
-                    item = json.loads(line)
-                    if item.get('task_id') == task_id:
-                        final_answer = item.get('Final answer')
-
-            agent = Agent()
-            submitted_answer = agent.run(
-                input=question_text + file_context,
-                task_id=task_id,
-                truth=final_answer
-            )
-
-            if submitted_answer == final_answer:
-                try:
-                    load_in_vector_db(
-                        markdown_content=f"{question_text}{file_context}\n\nFINAL ANSWER:{submitted_answer}",
-                        #metadatas={
-                        #    "task_id": task_id,
-                        #    "question": question_text,
-                        #    "file_name": file_name,
-                        #},
-                    )
-                    console.print(f"Correct answer vectorized and stored")
-                except Exception as e:
-                    console.print(f"Error loading in vector DB: {e}", style="bold red")
-
-            console.print(Panel(f"[bold green]Submitted Answer[/bold green]\n{submitted_answer}", expand=False))
-            console.print(Panel(f"The correct final answer is: [bold]{final_answer}[/bold]"))
-
-            results_log.append({"Task ID": task_id, "Question": question_text, "Submitted Answer": submitted_answer})
-            answers_payload.append({"task_id": task_id, "submitted_answer": submitted_answer})
-
-        except Exception as e:
-            console.print(f"Error: {e}", style="bold red")
-            results_log.append({"Task ID": task_id, "Question": question_text, "Submitted Answer": f"AGENT ERROR: {e}"})
-
-        time.sleep(1) # Rate limit for API calls
+    outcomes = asyncio.run(solve_all(questions_data, console))     # Outcomes keep the order of the questions
+
+    results_log = [log_entry for log_entry, _ in outcomes if log_entry]
+    answers_payload = [answer for _, answer in outcomes if answer]
 
     if not answers_payload:
         return "Agent did not produce any answers to submit.", pd.DataFrame(results_log)